@@ -0,0 +1,168 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+
+from parecer_text import rubric
+from semesters import record_semester
+
+FORMAT_VERSION = 2
+NO_LEVELS = "sem_niveis"  # Registros antigos com "opcao" e sem os níveis de cada característica
+
+
+def _bump(counter, key, delta=1):
+    value = counter.get(key, 0) + delta
+    if value:
+        counter[key] = value
+    else:
+        counter.pop(key, None)
+
+
+class Aggregates:
+    """
+    Números da turma mantidos incrementalmente, um parecer de cada vez.
+
+    Por parecer: total, situação final (mesma regra do texto do parecer:
+    `rubric.classify`), por professor, por mês, por professor/mês e por
+    semestre. Por aluno, vale o parecer mais recente: situação final de cada
+    aluno e distribuição dos níveis de cada característica. Acrescentar um
+    parecer custa O(1), e o resumo só depende do número de alunos, professores e
+    meses, nunca do tamanho do histórico.
+    """
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.records = data.get("registros", 0)
+        self.rubric_digest = data.get("rubrica_sha256", rubric.digest)
+        self.by_situation = data.get("por_situacao", {})
+        self.by_professor = data.get("por_professor", {})
+        self.by_month = data.get("por_mes", {})
+        self.by_professor_month = data.get("por_professor_mes", {})
+        self.by_semester = data.get("por_semestre", {})
+        self.latest = data.get("ultimo_por_aluno", {})  # aluno -> {"data", "situacao", "niveis"}
+        self.students_by_situation = data.get("alunos_por_situacao", {})
+        self.levels = data.get("niveis", {})  # característica -> nível -> alunos
+
+    def _latest_counts(self, latest, delta):
+        _bump(self.students_by_situation, latest["situacao"], delta)
+        for key, level in zip(rubric.keys, latest["niveis"] or ()):
+            _bump(self.levels.setdefault(key, {}), level, delta)
+
+    def add(self, entry):
+        levels = entry.get("characteristics_levels")
+        if levels:
+            combo = rubric.normalize(levels)
+            situation = rubric.classify(combo)
+        else:
+            combo, situation = None, NO_LEVELS
+        professor = entry.get("professor") or "?"
+        month = (entry.get("data") or "")[:7] or "?"
+
+        self.records += 1
+        _bump(self.by_situation, situation)
+        _bump(self.by_professor, professor)
+        _bump(self.by_month, month)
+        _bump(self.by_professor_month.setdefault(professor, {}), month)
+        _bump(self.by_semester, record_semester(entry))
+
+        student = entry.get("student_name")
+        if student:
+            previous = self.latest.get(student)
+            # Em empate de data vale o gravado por último
+            if previous is None or (entry.get("data") or "") >= previous["data"]:
+                if previous is not None:
+                    self._latest_counts(previous, -1)
+                latest = {"data": entry.get("data") or "", "situacao": situation, "niveis": list(combo) if combo else None}
+                self.latest[student] = latest
+                self._latest_counts(latest, 1)
+
+    def to_dict(self):
+        return {
+            "versao": FORMAT_VERSION,
+            "registros": self.records,
+            "rubrica_sha256": self.rubric_digest,
+            "por_situacao": self.by_situation,
+            "por_professor": self.by_professor,
+            "por_mes": self.by_month,
+            "por_professor_mes": self.by_professor_month,
+            "por_semestre": self.by_semester,
+            "ultimo_por_aluno": self.latest,
+            "alunos_por_situacao": self.students_by_situation,
+            "niveis": self.levels,
+        }
+
+
+class AggregatesFile:
+    """
+    Agregados persistidos em `path` (JSON) e acompanhados pelo `PareceresStore`.
+
+    O arquivo registra quantos pareceres do store já foram contados
+    (`registros`); `refresh` só lê os pareceres gravados depois disso e regrava
+    o arquivo. Se a rubrica mudar (outro hash) ou o store tiver menos pareceres
+    do que o arquivo (histórico substituído), os agregados são refeitos do zero.
+    """
+
+    def __init__(self, path, store):
+        self.path = path
+        self.store = store
+        self._lock = threading.Lock()
+        self._aggregates = None
+
+    def _read_file(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except ValueError:
+            return None
+        if data.get("versao") != FORMAT_VERSION or data.get("rubrica_sha256") != rubric.digest:
+            return None
+        return Aggregates(data)
+
+    def _write_file(self, aggregates):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(aggregates.to_dict(), f, ensure_ascii=False)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, self.path)
+
+    def refresh(self):
+        """Conta os pareceres novos (se houver) e retorna os agregados atualizados."""
+        with self._lock:
+            total = len(self.store)
+            current = self._aggregates
+            if current is None or current.records < total:
+                # Outro processo pode já ter contado parte dos pareceres novos
+                on_disk = self._read_file()
+                if on_disk is not None and on_disk.records <= total and (current is None or on_disk.records > current.records):
+                    current = on_disk
+            if current is None or current.records > total or current.rubric_digest != rubric.digest:
+                current = Aggregates()
+            if current.records < total:
+                for entry in self.store.entries(current.records):
+                    current.add(entry)
+                self._write_file(current)
+            self._aggregates = current
+            return current
+
+    def rebuild(self):
+        """Refaz os agregados a partir de todos os pareceres do store."""
+        with self._lock:
+            aggregates = Aggregates()
+            for entry in self.store.entries():
+                aggregates.add(entry)
+            self._write_file(aggregates)
+            self._aggregates = aggregates
+            return aggregates
+
+
+if __name__ == "__main__":
+    # Uso: python aggregates.py [data/pareceres.jsonl] [data/agregados.json]
+    from pareceres_store import PareceresStore
+
+    jsonl_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join("data", "pareceres.jsonl")
+    aggregates_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(jsonl_path), "agregados.json")
+    rebuilt = AggregatesFile(aggregates_path, PareceresStore(jsonl_path)).rebuild()
+    print(f"Agregados de {rebuilt.records} parecer(es) gravados em {aggregates_path}.")
@@ -3,228 +3,98 @@ import json
 import os
 from datetime import datetime
 from io import BytesIO
-from docx import Document
-import unicodedata
-from docx.enum.text import WD_ALIGN_PARAGRAPH # Importa para justificar o texto
+import tempfile
+import time
+from metrics import metrics
+from pareceres_store import PareceresStore, GroupCommitWriter, migrate_from_json
+from blob_store import BlobStore, content_digest, externalize_docx
+from template_cache import template_cache
+from bulk import LEVEL_COLUMNS, STUDENT_COLUMN, read_levels_csv, generate_batch
+from parecer_text import REPROVADO, RESSALVAS, APROVADO, rubric
+from roster import sanitize_student_name_for_filename
+from student_index import StudentIndex
+from materialize import ParecerRenderer, DIGEST_FIELD
+from aggregates import AggregatesFile, NO_LEVELS
+from semesters import RENDER_FIELD, current_semester, record_semester
+from archive import ArchiveSet, archive_closed_semesters
+
+# Início desta execução do script (cada interação reexecuta o app inteiro)
+_script_start = time.perf_counter()
 
 # --- Configurações Iniciais ---
 DATA_DIR = "data"
 USERS_FILE = os.path.join(DATA_DIR, "users.json")
-PARECERES_FILE = os.path.join(DATA_DIR, "pareceres.json")
+PARECERES_FILE = os.path.join(DATA_DIR, "pareceres.json") # Formato antigo (migrado na inicialização)
+PARECERES_LOG_FILE = os.path.join(DATA_DIR, "pareceres.jsonl") # Armazenamento append-only
+BLOBS_DIR = os.path.join(DATA_DIR, "blobs") # DOCX gerados, endereçados pelo hash do conteúdo
+BASE_TEMPLATE_FILE = os.path.join(DATA_DIR, "template_base.docx") # Template único da escola
+ROSTER_FILE = os.path.join(DATA_DIR, "alunos.json") # Dados pessoais dos alunos (preenchem o template base)
+AGGREGATES_FILE = os.path.join(DATA_DIR, "agregados.json") # Números do painel, atualizados a cada parecer salvo
+ARCHIVE_DIR = os.path.join(DATA_DIR, "arquivo") # Pareceres dos semestres encerrados, um arquivo comprimido por semestre
+METRICS_FILE = os.path.join(DATA_DIR, "metrics.prom") # Tempos das etapas no formato do Prometheus
+BATCH_ZIP_DIR = os.path.join(DATA_DIR, "lotes") # ZIPs dos pareceres gerados em lote, até serem baixados
+BATCH_ZIP_MAX_AGE = 24 * 60 * 60 # Segundos até um ZIP de lote ser apagado (no início de um novo lote)
+# True: o registro guarda só as entradas do parecer e o DOCX é refeito no download;
+# False: o DOCX gerado também é gravado no blob store
+DOCX_SOB_DEMANDA = True
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
 SCHOOL_NAME = "ESCOLA MUNICIPAL DE EDUCAÇÃO FUNDAMENTAL ELESBÃO BARBOSA DE CARVALHO"
 COORDENADOR_NAME = "NOME DO COORDENADOR AQUI" # Adicionado o nome do coordenador
-
-# Lista de Nomes de Alunos (mantida a mesma)
-STUDENT_NAMES = [
-    "Andressa Viturino dos Santos", "Carlos Eduardo Conceição da Silva", "Damiana Honorato dos Santos",
-    "Ivonete Nunes da Silva", "João Pedro da Silva", "José Alexandre Lemo da Silva",
-    "Joselma Conceição da Silva", "José Gonzaga de Melo", "Maria Angelica Honorato de Oliveira",
-    "Maria das Dores Rodrigues Pereira", "Nelson Pereira da Silva", "Nivaldilson Vitorino da Silva",
-    "Roberlange Pereira da Silva", "Rosania Valério da Silva", "Rosileide Ferreira da Silva",
-    "Thayse Ferreira dos Santos", "Alessandra Lopes da Silva", "Adenilson Lourenço dos Santos",
-    "Antônio Ronaldo Firmino", "Cicero da Silva", "Cristiano da Conceição Nogueira",
-    "Daiana Conceição da Silva", "Daniela da Conceição Nogueira", "Edimilson Lima de Queiroz",
-    "Eraldo Bernardino Gomes", "Ivanilda Ferreira dos Anjos", "João Batista Aureliano da Silva",
-    "Joana D’arc Gouveia da Silva", "José Eraldo Silva", "Juliana Conceição da Silva",
-    "Leonardo da Silva", "Maria de Lourdes Emerinda da Silva", "Maria Paula Viturino dos Santos",
-    "Maria Pereira da Silva", "Maria Rosilma da Conceição", "Quiteria Viturino Santos Barros",
-    "Vandilma dos Santos Silva", "Wellison Gomes Ferreira", "Ana Maria da Silva Aquino",
-    "Bartolomeu Ferreira Vanderlei", "Genilson Alves Araújo", "Nilda Barbosa Silva Santos",
-    "Vilma Maria de França", "Adalva Gomes dos Santos", "Adriano Viturino dos Santos",
-    "Aristeu Vitorino dos Santos", "Aurene de Melo Gonzaga", "Carlos Pereira da Silva",
-    "Cristóvão Pereira dos Santos", "Davino Conceição dos Santos", "Edineuza Teles da Silva",
-    "Estelita da Silva", "Francisco Lourenço da Silva", "Francisco Viturino dos Santos",
-    "Inês Juliana dos Santos", "Jânio Gonzaga de Melo", "José Adelmo Soares da Silva",
-    "José Edijario Soares Lemos", "José França da Silva", "José Honélio dos Santos",
-    "José Nilton Avelino", "José Ronaldo dos Santos", "José Vitorino Júnior",
-    "Joselia Honorato de Melo", "Jucilene de Melo Santos", "Manoel Alves Araújo",
-    "Marcio José Rodrigues Limeira", "Maria Aparecida dos Anjos Viturino",
-    "Maria Cleide da Silva", "Maria Gomes dos Santos", "Maria Jaqueline dos Santos Silva",
-    "Rosilânia da Silva Honorato", "Sebastião Rodrigues dos Santos", "Valdimira Gomes"
-]
+STUDENT_SEARCH_LIMIT = 20 # Quantos alunos a busca devolve para a lista de seleção
+# Semestre letivo dos novos pareceres ("AAAA.1"/"AAAA.2"); None: calculado pela data (janeiro a junho: .1)
+SEMESTRE_ATUAL = None
 
 os.makedirs(DATA_DIR, exist_ok=True)
 
 # --- Funções de Ajuda ---
-def load_data(filepath):
-    if not os.path.exists(filepath) or os.path.getsize(filepath) == 0:
-        return []
-    with open(filepath, "r", encoding="utf-8") as f:
-        return json.load(f)
-
 def save_data(data, filepath):
-    with open(filepath, "w", encoding="utf-8") as f:
+    # Grava em um arquivo temporário e renomeia: o arquivo nunca fica pela metade
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(filepath) or ".", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=4, ensure_ascii=False)
-
-def sanitize_student_name_for_filename(name):
-    """
-    Sanitiza o nome do aluno para ser usado como parte de um nome de arquivo.
-    Removes acentos, converte para minúsculas e substitui espaços por underscores.
-    """
-    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('utf-8')
-    name = name.lower()
-    name = name.replace(" ", "_")
-    name = "".join(c for c in name if c.isalnum() or c == '_')
-    return name
-
-# --- FUNÇÃO PARA GERAR O TEXTO DETALHADO DO PARECER (Com texto mais conciso) ---
-def generate_detailed_parecer_text(characteristics_levels, student_name):
-    """
-    Gera um texto detalhado e contínuo para o parecer, integrando todas as características
-    e buscando aproximar-se de 100-150 palavras.
-    """
-    comportamento = characteristics_levels["comportamento"]
-    participacao = characteristics_levels["participacao"]
-    leitura_escrita = characteristics_levels["leitura_escrita"]
-    matematica = characteristics_levels["matematica"]
-
-    parecer_parts = []
-
-    # Introdução geral (Aprox. 20 palavras)
-    parecer_parts.append(f"Este parecer detalha o desenvolvimento de {student_name} no período letivo, abordando seu progresso acadêmico e social.")
-
-    # Detalhes sobre Comportamento (Aprox. 20-30 palavras cada)
-    if comportamento == "Ótimo":
-        parecer_parts.append("Demonstra comportamento exemplar, contribuindo ativamente para um ambiente de aprendizado positivo e harmonioso. Sua postura disciplinada inspira os colegas.")
-    elif comportamento == "Bom":
-        parecer_parts.append("Comportamento consistentemente bom, respeitando normas e mantendo conduta adequada. Contribui positivamente para o bom andamento das atividades.")
-    elif comportamento == "Regular":
-        parecer_parts.append("Comportamento geralmente adequado, mas com momentos de distração, necessitando de lembretes para manter o foco. Há espaço para aprimoramento na autorregulação.")
-    else: # Ruim
-        parecer_parts.append("Comportamento desafiador em sala de aula, com dificuldades em seguir regras e focar, gerando interrupções. Intervenções específicas são cruciais.")
-
-    # Detalhes sobre Participação (Aprox. 20-30 palavras cada)
-    if participacao == "Ótimo":
-        parecer_parts.append("Participação notavelmente ativa e pertinente, com grande interesse pelos conteúdos. Realiza perguntas perspicazes e oferece contribuições valiosas.")
-    elif participacao == "Bom":
-        parecer_parts.append("Participa de forma consistente, mostrando interesse e esforço em contribuir. Busca interagir e se envolver para aprofundar seu entendimento.")
-    elif participacao == "Regular":
-        parecer_parts.append("A participação é pontual e ocasional. Demonstra potencial, mas por vezes reticência em se expressar. Incentivos adicionais podem estimular maior engajamento.")
-    else: # Ruim
-        parecer_parts.append("Participação mínima em sala de aula, com pouca iniciativa para interagir. Essa passividade limita o aproveitamento e a consolidação do aprendizado.")
-
-    # Detalhes sobre Leitura e Escrita (Aprox. 20-30 palavras cada)
-    if leitura_escrita == "Ótimo":
-        parecer_parts.append("Excelente capacidade de leitura e escrita, com compreensão aprofundada de textos complexos. Produz textos coesos, coerentes e bem estruturados, com vocabulário rico.")
-    elif leitura_escrita == "Bom":
-        parecer_parts.append("Boa habilidade em leitura e escrita, compreendendo a maioria dos textos e expressando-se claramente. Produz redações com ideias bem definidas, com refinamentos pontuais.")
-    elif leitura_escrita == "Regular":
-        parecer_parts.append("Nível regular de leitura e escrita, com dificuldades na compreensão de nuances ou elaboração de frases complexas. Práticas direcionadas são necessárias para maior autonomia.")
-    else: # Ruim
-        parecer_parts.append("Significativas dificuldades em leitura e escrita, impactando a compreensão e produção de ideias. Esforços contínuos e intervenções pedagógicas específicas são cruciais.")
-
-    # Detalhes sobre Matemática (Aprox. 20-30 palavras cada)
-    if matematica == "Ótimo":
-        parecer_parts.append("Excelente domínio das operações e conceitos matemáticos. Resolve problemas com autonomia, aplicando diferentes estratégias e justificando raciocínios logicamente. Aptidão evidente.")
-    elif matematica == "Bom":
-        parecer_parts.append("Boa capacidade em operações matemáticas básicas e compreensão dos conceitos. Aplica o conhecimento em diversas situações, mostrando solidez em sua base.")
-    elif matematica == "Regular":
-        parecer_parts.append("Realiza operações matemáticas básicas com alguma dificuldade, demandando tempo e suporte. Revisão de conceitos e prática constante são recomendadas para fortalecer proficiência.")
-    else: # Ruim
-        parecer_parts.append("Grande dificuldade em operações e conceitos matemáticos básicos. Domínio numérico e lógico limitado, exigindo plano de intervenção intensivo para construir base sólida.")
-
-    # Nova Lógica de Reprovação (1. Aluno só reprova se Leitura/Escrita E Matemática forem Ruim)
-    reprovado = False
-    if leitura_escrita == "Ruim" and matematica == "Ruim":
-        reprovado = True
-    
-    ressalvas = False
-    for level in characteristics_levels.values():
-        if level == "Regular":
-            ressalvas = True
-            break # Se houver qualquer "Regular", já marca como ressalvas
-
-    # Conclusão do parecer (Aprox. 25-35 palavras cada)
-    if reprovado:
-        conclusao = "Diante do exposto, e considerando os desafios persistentes em leitura e matemática, o aluno não atingiu os critérios necessários para aprovação neste período letivo."
-    elif ressalvas:
-        conclusao = "Aluno(a) aprovado(a) com ressalvas, sendo crucial que o acompanhamento pedagógico e as intervenções específicas sejam mantidas. O foco deve ser nas áreas que demandam maior desenvolvimento para progresso consistente."
-    else:
-        conclusao = "Conclui-se que o aluno(a) foi aprovado(a). Seu desempenho e desenvolvimento geral indicam que atingiu os objetivos propostos para o período, demonstrando preparo para avançar para a próxima etapa."
-
-    parecer_parts.append(conclusao)
-
-    # Junta todas as partes em um texto único
-    full_text = "\n\n".join(parecer_parts)
-    # Substitui o nome do aluno em todas as partes da descrição gerada
-    full_text = full_text.replace("{student_name}", student_name)
-    return full_text
-
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, filepath)
 
 # --- FUNÇÃO GERAR_DOCX_PARECER ---
+def student_template_path(student_name):
+    """Caminho do antigo template DOCX específico do aluno."""
+    sanitized_name = sanitize_student_name_for_filename(student_name)
+    return os.path.join(DATA_DIR, f"template_{sanitized_name}.docx")
+
+def novo_registro_parecer(student_name, characteristics_levels, teacher_name, when, template_file, roster_entry):
+    """Registro de um novo parecer com as entradas necessárias para refazer o DOCX."""
+    semestre = current_semester(SEMESTRE_ATUAL, when)
+    return {
+        "student_name": student_name,
+        "data": when.strftime("%Y-%m-%d %H:%M:%S"),
+        "semestre": semestre,
+        "professor": teacher_name,
+        "characteristics_levels": characteristics_levels,
+        RENDER_FIELD: renderer.spec(template_file, when, semestre, COORDENADOR_NAME, roster_entry),
+    }
+
 def gerar_docx_parecer(student_name, characteristics_levels, teacher_name):
     """
-    Gera o documento DOCX do parecer preenchendo o template específico do aluno.
+    Gera o documento DOCX do parecer preenchendo o template do aluno.
+    Retorna (buffer do DOCX, registro do parecer) ou (None, None) em caso de erro.
     """
-    sanitized_name = sanitize_student_name_for_filename(student_name)
-    student_template_file = os.path.join(DATA_DIR, f"template_{sanitized_name}.docx")
+    template_file, roster_entry = student_index.resolve(student_name)
 
-    if not os.path.exists(student_template_file):
-        st.error(f"Erro: O template específico para '{student_name}' não foi encontrado.")
-        st.info(f"Por favor, crie o arquivo '{os.path.basename(student_template_file)}' na pasta 'data/' com as informações pessoais do aluno e os placeholders necessários.")
-        return None
+    if template_file is None:
+        st.error(f"Erro: Os dados de '{student_name}' não foram encontrados.")
+        st.info(f"Cadastre o aluno em '{os.path.basename(ROSTER_FILE)}' (com '{os.path.basename(BASE_TEMPLATE_FILE)}' na pasta 'data/') ou crie o arquivo '{os.path.basename(student_template_path(student_name))}' na pasta 'data/'.")
+        return None, None
 
     try:
-        document = Document(student_template_file)
-
-        full_parecer_text = generate_detailed_parecer_text(characteristics_levels, student_name)
-        
-        current_date = datetime.now()
-        dia = current_date.strftime("%d")
-        mes_extenso = current_date.strftime("%B").replace("January", "Janeiro").replace("February", "Fevereiro").replace("March", "Março").replace("April", "Abril").replace("May", "Maio").replace("June", "Junho").replace("July", "Julho").replace("August", "Agosto").replace("September", "Setembro").replace("October", "Outubro").replace("November", "Novembro").replace("December", "Dezembro")
-        ano = current_date.strftime("%Y")
-
-        replacements = {
-            "{{NOME_ALUNO}}": student_name,
-            "{{PARECER_GERADO}}": full_parecer_text,
-            "{{NOME_PROFESSOR}}": teacher_name,
-            "{{NOME_COORDENADOR}}": COORDENADOR_NAME, # Novo placeholder para coordenador
-            "{{DATA_PARECER}}": current_date.strftime("%d/%m/%Y"),
-            "{{DIA_PARECER}}": dia,
-            "{{MES_PARECER}}": mes_extenso,
-            "{{ANO_CORRENTE}}": ano,
-            "{{SEMESTRE}}": "2025.1"
-        }
-
-        # Função para substituir placeholders em parágrafos, aplicar justificação e definir fonte
-        def replace_and_format_paragraph(paragraph, old_text, new_text):
-            full_paragraph_text = "".join(run.text for run in paragraph.runs)
-            
-            if old_text in full_paragraph_text:
-                # Limpa os runs existentes no parágrafo
-                for i in range(len(paragraph.runs) - 1, -1, -1):
-                    paragraph._element.remove(paragraph.runs[i]._element)
-                
-                # Adiciona o novo texto como um único run
-                new_run = paragraph.add_run(new_text)
-
-                # Aplica justificação e define a fonte Times New Roman se for o placeholder do parecer gerado
-                if old_text == "{{PARECER_GERADO}}":
-                    paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-                    new_run.font.name = "Times New Roman" # Define a fonte Times New Roman
-
-        # Iterar sobre todos os parágrafos do documento e substituir os placeholders
-        for paragraph in document.paragraphs:
-            for key, value in replacements.items():
-                replace_and_format_paragraph(paragraph, key, value)
-
-        # Iterar sobre as tabelas (se houver) e substituir os placeholders
-        for table in document.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    for paragraph in cell.paragraphs:
-                        for key, value in replacements.items():
-                            replace_and_format_paragraph(paragraph, key, value)
-
-        buffer = BytesIO()
-        document.save(buffer)
-        buffer.seek(0)
-        return buffer
+        registro = novo_registro_parecer(student_name, characteristics_levels, teacher_name, datetime.now(), template_file, roster_entry)
+        # A primeira renderização já fica no cache do renderer para os próximos downloads
+        return BytesIO(renderer.render(registro)), registro
     except Exception as e:
         st.error(f"Ocorreu um erro ao preencher o DOCX: {e}")
         st.info("Verifique se o template DOCX está correto e se o nome dos placeholders está exato.")
         st.info("Certifique-se de que a biblioteca 'python-docx' está instalada (`pip install python-docx`).")
-        return None
+        return None, None
 
 
 # --- Carregar Usuários (ou criar se não existirem) ---
@@ -250,10 +120,117 @@ def initialize_users():
         save_data(users, USERS_FILE)
     return users
 
-users = initialize_users()
-
-# Carregar pareceres existentes
-pareceres_salvos = load_data(PARECERES_FILE)
+# --- Recursos compartilhados pelo processo ---
+# O Streamlit reexecuta este script a cada interação; o que é caro fica em cache
+# e só é refeito quando o arquivo correspondente muda em disco.
+def file_mtime(filepath):
+    return os.stat(filepath).st_mtime_ns if os.path.exists(filepath) else None
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_users(users_mtime):
+    # `users_mtime` faz parte da chave do cache: alterar users.json recarrega os usuários
+    return initialize_users()
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_student_index(roster_mtime, base_template_mtime):
+    # Refeito só quando alunos.json ou o template base mudam; a pasta de dados é listada
+    # uma vez aqui (um template antigo incluído depois só entra quando o índice for refeito)
+    return StudentIndex.build(ROSTER_FILE, DATA_DIR, os.path.basename(BASE_TEMPLATE_FILE))
+
+@st.cache_resource(show_spinner=False)
+def get_blob_store():
+    return BlobStore(BLOBS_DIR)
+
+@st.cache_resource(show_spinner=False)
+def get_renderer():
+    # DOCX refeitos a partir dos registros, com LRU dos mais recentes
+    return ParecerRenderer(get_blob_store())
+
+@st.cache_resource(show_spinner=False)
+def get_pareceres_store():
+    # Uma instância por processo: o índice em memória é compartilhado pelas sessões e
+    # só lê do disco o que foi acrescentado (ou tudo, se o arquivo for substituído)
+    store = PareceresStore(PARECERES_LOG_FILE)
+    migrate_from_json(PARECERES_FILE, store, lambda r: externalize_docx(r, get_blob_store()))
+    return store
+
+@st.cache_resource(show_spinner=False)
+def get_aggregates():
+    return AggregatesFile(AGGREGATES_FILE, get_pareceres_store())
+
+@st.cache_resource(show_spinner=False)
+def get_archives():
+    # Só o índice de cada semestre arquivado fica em memória, e só depois de aberto
+    return ArchiveSet(ARCHIVE_DIR)
+
+@st.cache_resource(show_spinner=False)
+def get_pareceres_writer():
+    # Escritor único do processo: junta os saves de todas as sessões em lotes
+    return GroupCommitWriter(get_pareceres_store())
+
+with metrics.span("inicio.usuarios"):
+    users = load_users(file_mtime(USERS_FILE))
+
+# Cadastro dos alunos indexado para a busca e para a escolha do template
+with metrics.span("inicio.alunos"):
+    student_index = load_student_index(file_mtime(ROSTER_FILE), file_mtime(BASE_TEMPLATE_FILE))
+
+# Armazenamento dos pareceres (append-only; migra o pareceres.json antigo uma única vez)
+with metrics.span("inicio.pareceres"):
+    pareceres_store = get_pareceres_store()
+    pareceres_writer = get_pareceres_writer()
+    blob_store = get_blob_store()
+    renderer = get_renderer()
+    aggregates = get_aggregates()
+    archives = get_archives()
+
+# `fonte` é o store dos pareceres ativos ou o arquivo de um semestre encerrado (mesma API de leitura)
+def find_parecer(fonte, parecer_info):
+    """
+    Registro completo de um parecer listado. Os downloads rodam depois que a página
+    foi desenhada e, nesse meio-tempo, um arquivamento pode ter renumerado os ids do
+    store; por isso a busca é pela identidade do parecer (`find`) e, se ele tiver
+    sido arquivado, continua no arquivo do seu semestre.
+    """
+    parecer = fonte.find(parecer_info)
+    if parecer is None and fonte is pareceres_store:
+        semestre = record_semester(parecer_info)
+        if semestre in archives.semesters():
+            parecer = archives.open(semestre).find(parecer_info)
+    if parecer is None:
+        raise LookupError(f"Parecer de {parecer_info.get('student_name', '?')} ({parecer_info.get('data', '?')}) não encontrado.")
+    return parecer
+
+def load_legacy_docx(fonte, parecer_info):
+    """Lê do disco e decodifica o DOCX em hex de um registro no formato antigo."""
+    parecer = find_parecer(fonte, parecer_info)
+    try:
+        with metrics.span("download.hex"):
+            return bytes.fromhex(parecer.get('docx_data') or "")
+    except ValueError:
+        raise ValueError(f"Erro ao carregar DOCX do parecer de {parecer_info.get('student_name', '?')}. Dados corrompidos.")
+
+def load_blob_docx(digest):
+    with metrics.span("download.blob"):
+        return blob_store.read(digest)
+
+def remove_old_batch_zips():
+    # Apaga os ZIPs de lotes antigos (de qualquer sessão) para a pasta não crescer sem limite
+    limite = time.time() - BATCH_ZIP_MAX_AGE
+    for item in os.scandir(BATCH_ZIP_DIR):
+        try:
+            if item.name.endswith(".zip") and item.stat().st_mtime < limite:
+                os.remove(item.path)
+        except FileNotFoundError:
+            pass # Outra sessão já apagou
+
+def load_zip(zip_path):
+    with open(zip_path, "rb") as f:
+        return f.read()
+
+def render_docx(fonte, parecer_info):
+    with metrics.span("download.render"):
+        return renderer.render(find_parecer(fonte, parecer_info))
 
 # --- Layout do Streamlit ---
 st.set_page_config(
@@ -297,116 +274,349 @@ else:
     if st.session_state.role == "professor":
         st.header("Gerar Parecer de Aluno")
 
+        # Só os primeiros resultados da busca vão para a lista (o cadastro pode ter milhares de alunos)
+        busca_aluno = st.text_input("Buscar aluno:", placeholder="Parte do nome, sem precisar de acentos (ex.: joao silva)", key="student_search")
+        total_encontrados, alunos_encontrados = student_index.search(busca_aluno, STUDENT_SEARCH_LIMIT)
         selected_student = st.selectbox(
             "Selecione o Aluno:",
-            [""] + sorted(STUDENT_NAMES),
+            [""] + alunos_encontrados,
             key="student_name_select"
         )
+        if total_encontrados > len(alunos_encontrados):
+            st.caption(f"Mostrando {len(alunos_encontrados)} de {total_encontrados} aluno(s); refine a busca para encontrar outros.")
+        elif busca_aluno and not total_encontrados:
+            st.caption("Nenhum aluno encontrado.")
 
         st.subheader("Avaliação das Características:")
-        levels_options = ["Bom", "Ótimo", "Regular", "Ruim"]
+        levels_options = rubric.levels
 
-        comportamento_level = st.selectbox("Comportamento:", levels_options, key="comportamento_level")
-        participacao_level = st.selectbox("Participação em sala de aula:", levels_options, key="participacao_level")
-        leitura_escrita_level = st.selectbox("Capacidade de leitura e escrita:", levels_options, key="leitura_escrita_level")
-        matematica_level = st.selectbox("Operações matemáticas básicas:", levels_options, key="matematica_level")
+        # Um seletor por característica da rubrica (rubrica.json)
+        characteristics_levels = {
+            caracteristica["chave"]: st.selectbox(caracteristica["rotulo"], levels_options, key=f"{caracteristica['chave']}_level")
+            for caracteristica in rubric.characteristics
+        }
 
         if st.button("Gerar e Salvar Parecer em DOCX", key="generate_save_docx_button"):
             if selected_student:
-                characteristics_levels = {
-                    "comportamento": comportamento_level,
-                    "participacao": participacao_level,
-                    "leitura_escrita": leitura_escrita_level,
-                    "matematica": matematica_level
-                }
-                
-                docx_buffer = gerar_docx_parecer(selected_student, characteristics_levels, st.session_state.username)
+                with metrics.span("parecer.gerar"):
+                    docx_buffer, registro = gerar_docx_parecer(selected_student, characteristics_levels, st.session_state.username)
                 
                 if docx_buffer:
                     docx_bytes = docx_buffer.getvalue()
                     file_name = f"parecer_{sanitize_student_name_for_filename(selected_student)}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx"
 
-                    pareceres_salvos.append({
-                        "student_name": selected_student,
-                        "data": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        "professor": st.session_state.username,
-                        "characteristics_levels": characteristics_levels,
-                        "docx_data": docx_bytes.hex()
-                    })
-                    save_data(pareceres_salvos, PARECERES_FILE)
+                    if DOCX_SOB_DEMANDA:
+                        # Só o hash do conteúdo, para conferir as próximas renderizações
+                        registro[DIGEST_FIELD] = content_digest(docx_bytes)
+                    else:
+                        with metrics.span("salvar.blob"):
+                            registro["docx_sha256"] = blob_store.put(docx_bytes)
+                    # Enfileira no escritor do processo e espera a confirmação da gravação
+                    with metrics.span("salvar.registro"):
+                        pareceres_writer.write(registro)
+                    with metrics.span("salvar.agregados"):
+                        aggregates.refresh()
 
                     st.download_button(
                         label="Baixar Parecer Gerado (DOCX)",
                         data=docx_bytes,
                         file_name=file_name,
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                        mime=DOCX_MIME
                     )
                     st.success(f"Parecer para **{selected_student}** gerado e salvo com sucesso!")
             else:
                 st.warning("Por favor, selecione o nome do aluno para gerar o parecer.")
 
+        # --- Geração em lote (turma inteira) ---
+        st.markdown("---")
+        st.subheader("Gerar Pareceres da Turma Inteira")
+        with st.expander("Preencher os níveis da turma e gerar todos os pareceres de uma vez"):
+            st.write(f"Preencha os níveis de cada aluno na tabela ou envie um CSV com as colunas `{','.join((STUDENT_COLUMN,) + LEVEL_COLUMNS)}`.")
+            arquivo_csv = st.file_uploader("CSV com os níveis da turma (opcional):", type=["csv"], key="bulk_csv_upload")
+
+            if arquivo_csv is not None:
+                grade_turma, erros_csv = read_levels_csv(arquivo_csv.getvalue(), levels_options)
+                for erro_csv in erros_csv:
+                    st.error(erro_csv)
+                chave_grade = "bulk_levels_grid_csv"
+            else:
+                turmas = student_index.classes()
+                turma_lote = st.selectbox("Turma:", list(turmas), key="bulk_class_select")
+                grade_turma = [
+                    {STUDENT_COLUMN: nome, **{coluna: "Bom" for coluna in LEVEL_COLUMNS}}
+                    for nome in turmas.get(turma_lote, [])
+                ]
+                # Uma grade por turma: trocar de turma não mistura os níveis já preenchidos
+                chave_grade = f"bulk_levels_grid_{sanitize_student_name_for_filename(turma_lote or '')}"
+
+            grade_editada = st.data_editor(
+                grade_turma,
+                column_config={coluna: st.column_config.SelectboxColumn(options=levels_options, required=True) for coluna in LEVEL_COLUMNS},
+                disabled=[STUDENT_COLUMN],
+                hide_index=True,
+                key=chave_grade
+            )
+
+            if st.button("Gerar Pareceres da Turma (ZIP)", key="bulk_generate_button"):
+                agora = datetime.now()
+                jobs = []
+                sem_template = []
+                for linha in grade_editada:
+                    nome_aluno = linha[STUDENT_COLUMN]
+                    template_path, dados_aluno = student_index.resolve(nome_aluno)
+                    if template_path is None:
+                        sem_template.append(nome_aluno)
+                        continue
+                    niveis = {coluna: linha[coluna] for coluna in LEVEL_COLUMNS}
+                    registro = novo_registro_parecer(nome_aluno, niveis, st.session_state.username, agora, template_path, dados_aluno)
+                    jobs.append({
+                        "template_path": renderer.template_path(registro),
+                        "replacements": renderer.replacements(registro),
+                        "file_name": f"parecer_{sanitize_student_name_for_filename(nome_aluno)}_{agora.strftime('%Y%m%d_%H%M%S')}.docx",
+                        "record": registro
+                    })
+
+                if sem_template:
+                    st.warning(f"Dados/template não encontrados para: {', '.join(sem_template)}")
+
+                if jobs:
+                    # O ZIP vai sendo escrito em disco conforme cada DOCX fica pronto
+                    # Nome único no disco: duas sessões do mesmo professor no mesmo segundo não dividem o arquivo
+                    zip_name = f"pareceres_turma_{sanitize_student_name_for_filename(st.session_state.username)}_{agora.strftime('%Y%m%d_%H%M%S')}.zip"
+                    os.makedirs(BATCH_ZIP_DIR, exist_ok=True)
+                    remove_old_batch_zips()
+                    zip_fd, zip_path = tempfile.mkstemp(dir=BATCH_ZIP_DIR, prefix=zip_name[:-len(".zip")] + "_", suffix=".zip")
+                    os.close(zip_fd)
+                    barra_progresso = st.progress(0.0, text="Gerando pareceres...")
+                    try:
+                        with metrics.span("lote.gerar"):
+                            registros, erros_lote = generate_batch(
+                                jobs, zip_path, blob_store, pareceres_store, keep_docx=not DOCX_SOB_DEMANDA,
+                                on_progress=lambda feitos, total: barra_progresso.progress(feitos / total, text=f"Gerando pareceres... {feitos}/{total}")
+                            )
+                    except BaseException:
+                        os.remove(zip_path)
+                        raise
+                    for job, erro in erros_lote:
+                        st.error(f"Erro ao gerar o parecer de {job['record']['student_name']}: {erro}")
+
+                    antigo_zip = st.session_state.get("bulk_zip_path")
+                    if antigo_zip and os.path.exists(antigo_zip):
+                        os.remove(antigo_zip)
+                    st.session_state.bulk_zip_path = zip_path
+                    st.session_state.bulk_zip_name = zip_name
+                    with metrics.span("salvar.agregados"):
+                        aggregates.refresh()
+                    st.success(f"{len(registros)} parecer(es) gerado(s) e salvo(s) com sucesso!")
+
+            bulk_zip_path = st.session_state.get("bulk_zip_path")
+            if bulk_zip_path and os.path.exists(bulk_zip_path):
+                st.download_button(
+                    label="Baixar Pareceres da Turma (ZIP)",
+                    data=lambda path=bulk_zip_path: load_zip(path),
+                    file_name=st.session_state.get("bulk_zip_name", os.path.basename(bulk_zip_path)),
+                    mime="application/zip",
+                    key="bulk_download_zip"
+                )
+
     elif st.session_state.role == "admin":
         st.header("Visualizar e Baixar Pareceres")
 
-        if not pareceres_salvos:
-            st.info("Nenhum parecer salvo ainda.")
+        mensagem_arquivo = st.session_state.pop("archive_message", None)
+        if mensagem_arquivo:
+            st.success(mensagem_arquivo)
+
+        # Pareceres ativos (semestre em andamento) ou um semestre encerrado, lido do seu arquivo comprimido
+        semestre_atual = current_semester(SEMESTRE_ATUAL)
+        semestre_admin = st.selectbox(
+            "Semestre:",
+            [""] + archives.semesters(),
+            format_func=lambda s: f"{s} (arquivado)" if s else f"{semestre_atual} (em andamento)",
+            key="admin_semester_select"
+        )
+        with metrics.span("painel.agregados"):
+            # Só os pareceres gravados desde a última atualização são lidos
+            agregados_ativos = aggregates.refresh()
+        if semestre_admin:
+            with metrics.span("arquivo.abrir"):
+                fonte_pareceres = archives.open(semestre_admin)
+                agregados = fonte_pareceres.aggregates()
         else:
-            alunos_com_pareceres = sorted(list(set(p.get('student_name') for p in pareceres_salvos if 'student_name' in p)))
-
-            if not alunos_com_pareceres:
-                st.info("Nenhum parecer salvo ainda com nome de aluno.")
+            fonte_pareceres = pareceres_store
+            agregados = agregados_ativos
+            semestres_encerrados = sorted(s for s in agregados_ativos.by_semester if s != semestre_atual)
+            if semestres_encerrados:
+                st.info(f"Há pareceres de semestres encerrados entre os ativos: {', '.join(semestres_encerrados)}. Arquivá-los deixa só o semestre em andamento no armazenamento ativo; eles continuam disponíveis aqui, pelo seletor de semestre.")
+                if st.button("Arquivar semestres encerrados", key="archive_semesters_button"):
+                    with metrics.span("arquivo.arquivar"):
+                        movidos = archive_closed_semesters(pareceres_store, ARCHIVE_DIR, semestre_atual)
+                        aggregates.refresh()
+                    st.session_state.archive_message = f"{sum(movidos.values())} parecer(es) arquivado(s): " + ", ".join(f"{sem} ({total})" for sem, total in movidos.items()) + "."
+                    st.rerun()
+        # Um conjunto de filtros por semestre: trocar de semestre não carrega filtros que não existem no outro
+        chave_semestre = semestre_admin or "ativo"
+
+        aba_pareceres, aba_painel, aba_desempenho = st.tabs(["Pareceres", "Painel", "Desempenho"])
+
+        with aba_pareceres:
+            # Apenas o índice (metadados) é consultado; o DOCX de cada parecer é lido do disco sob demanda
+            if len(fonte_pareceres) == 0:
+                st.info("Nenhum parecer salvo ainda.")
             else:
-                selected_student_admin = st.selectbox(
-                    "Selecione um aluno para visualizar os pareceres:",
-                    [""] + alunos_com_pareceres,
-                    key="admin_student_select"
-                )
+                alunos_com_pareceres = fonte_pareceres.students()
 
-                pareceres_a_exibir = []
-                if not selected_student_admin:
-                    pareceres_a_exibir = pareceres_salvos
+                if not alunos_com_pareceres:
+                    st.info("Nenhum parecer salvo ainda com nome de aluno.")
                 else:
-                    pareceres_a_exibir = [p for p in pareceres_salvos if p.get('student_name') == selected_student_admin]
-
-                if not pareceres_a_exibir:
-                    st.info(f"Nenhum parecer encontrado para {selected_student_admin}.")
-                else:
-                    if not selected_student_admin:
-                        st.subheader("Todos os Pareceres Salvos:")
+                    col_aluno, col_dia, col_tamanho = st.columns([3, 2, 1])
+                    with col_aluno:
+                        selected_student_admin = st.selectbox(
+                            "Selecione um aluno para visualizar os pareceres:",
+                            [""] + alunos_com_pareceres,
+                            key=f"admin_student_select_{chave_semestre}"
+                        )
+                    with col_dia:
+                        selected_date_admin = st.selectbox(
+                            "Filtrar por dia:",
+                            [""] + fonte_pareceres.dates(),
+                            format_func=lambda d: datetime.strptime(d, "%Y-%m-%d").strftime("%d/%m/%Y") if d else "Todos",
+                            key=f"admin_date_select_{chave_semestre}"
+                        )
+                    with col_tamanho:
+                        page_size = st.selectbox("Por página:", [10, 25, 50], key="admin_page_size")
+
+                    total_pareceres, _ = fonte_pareceres.query(selected_student_admin, selected_date_admin, limit=0)
+                    total_paginas = max(1, (total_pareceres + page_size - 1) // page_size)
+                    pagina = st.number_input(f"Página (de {total_paginas}):", min_value=1, max_value=total_paginas, value=1, step=1, key=f"admin_page_{chave_semestre}")
+                    inicio = (pagina - 1) * page_size
+                    _, pareceres_a_exibir = fonte_pareceres.query(selected_student_admin, selected_date_admin, offset=inicio, limit=page_size)
+
+                    if not pareceres_a_exibir:
+                        st.info(f"Nenhum parecer encontrado para {selected_student_admin or 'o filtro selecionado'}.")
                     else:
-                        st.subheader(f"Pareceres para {selected_student_admin}:")
-
-                    for i, parecer_info in enumerate(pareceres_a_exibir):
-                        student_name_display = parecer_info.get('student_name', 'Aluno Desconhecido')
-                        st.markdown(f"**Parecer {i+1} para {student_name_display}**")
-                        st.write(f"**Data:** {parecer_info['data']}")
-                        st.write(f"**Professor:** {parecer_info['professor']}")
+                        if not selected_student_admin:
+                            st.subheader("Todos os Pareceres Salvos:")
+                        else:
+                            st.subheader(f"Pareceres para {selected_student_admin}:")
+                        st.caption(f"Exibindo {inicio + 1}–{inicio + len(pareceres_a_exibir)} de {total_pareceres} parecer(es).")
+
+                        for i, parecer_info in enumerate(pareceres_a_exibir, start=inicio):
+                            student_name_display = parecer_info.get('student_name', 'Aluno Desconhecido')
+                            st.markdown(f"**Parecer {i+1} para {student_name_display}**")
+                            st.write(f"**Data:** {parecer_info['data']}")
+                            st.write(f"**Professor:** {parecer_info['professor']}")
                         
-                        if 'characteristics_levels' in parecer_info:
-                            st.write(f"**Níveis Avaliados:**")
-                            st.write(f"  - Comportamento: {parecer_info['characteristics_levels'].get('comportamento', 'N/A')}")
-                            st.write(f"  - Participação: {parecer_info['characteristics_levels'].get('participacao', 'N/A')}")
-                            st.write(f"  - Leitura/Escrita: {parecer_info['characteristics_levels'].get('leitura_escrita', 'N/A')}")
-                            st.write(f"  - Matemática: {parecer_info['characteristics_levels'].get('matematica', 'N/A')}")
-                        elif 'opcao' in parecer_info:
-                             st.write(f"**Opção Geral (Legado):** {parecer_info['opcao']}")
-
-                        if 'docx_data' in parecer_info and parecer_info['docx_data']:
-                            try:
-                                docx_data_bytes = bytes.fromhex(parecer_info['docx_data'])
-                                file_name = f"parecer_{sanitize_student_name_for_filename(student_name_display)}_{parecer_info['data'].replace(' ', '_').replace(':', '')}_{i}.docx"
+                            if 'characteristics_levels' in parecer_info:
+                                st.write(f"**Níveis Avaliados:**")
+                                for caracteristica in rubric.characteristics:
+                                    st.write(f"  - {caracteristica['rotulo_curto']}: {parecer_info['characteristics_levels'].get(caracteristica['chave'], 'N/A')}")
+                            elif 'opcao' in parecer_info:
+                                 st.write(f"**Opção Geral (Legado):** {parecer_info['opcao']}")
+
+                            file_name = f"parecer_{sanitize_student_name_for_filename(student_name_display)}_{parecer_info['data'].replace(' ', '_').replace(':', '')}_{i}.docx"
+                            docx_sha256 = parecer_info.get('docx_sha256')
+
+                            # Os bytes só são lidos do disco quando o download da linha é solicitado
+                            if docx_sha256 and blob_store.exists(docx_sha256):
                                 st.download_button(
                                     label=f"Baixar Parecer {i+1} (DOCX)",
-                                    data=docx_data_bytes,
+                                    data=lambda digest=docx_sha256: load_blob_docx(digest),
                                     file_name=file_name,
-                                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                                    key=f"admin_download_docx_{student_name_display}_{i}"
+                                    mime=DOCX_MIME,
+                                    key=f"admin_download_docx_{chave_semestre}_{parecer_info['id']}"
                                 )
-                            except ValueError:
+                            elif parecer_info.get(f"has_{RENDER_FIELD}"):
+                                # Refeito a partir das entradas do registro (e guardado no LRU do renderer)
+                                st.download_button(
+                                    label=f"Baixar Parecer {i+1} (DOCX)",
+                                    data=lambda info=parecer_info, fonte=fonte_pareceres: render_docx(fonte, info),
+                                    file_name=file_name,
+                                    mime=DOCX_MIME,
+                                    key=f"admin_download_docx_{chave_semestre}_{parecer_info['id']}"
+                                )
+                            elif parecer_info.get('docx_data_corrompido'):
                                 st.error(f"Erro ao carregar DOCX para o parecer {i+1}. Dados corrompidos.")
-                        else:
-                            st.info(f"DOCX não disponível para o parecer {i+1}.")
-                        st.markdown("---")
+                            elif not docx_sha256 and parecer_info.get('has_docx_data'):
+                                # Registros antigos trazem o DOCX em hex dentro do próprio registro
+                                st.download_button(
+                                    label=f"Baixar Parecer {i+1} (DOCX)",
+                                    data=lambda info=parecer_info, fonte=fonte_pareceres: load_legacy_docx(fonte, info),
+                                    file_name=file_name,
+                                    mime=DOCX_MIME,
+                                    key=f"admin_download_docx_{chave_semestre}_{parecer_info['id']}"
+                                )
+                            else:
+                                st.info(f"DOCX não disponível para o parecer {i+1}.")
+                            st.markdown("---")
+
+        with aba_painel:
+            if semestre_admin:
+                st.caption(f"Números do semestre {semestre_admin}, calculados no arquivamento.")
+            if agregados.records == 0:
+                st.info("Nenhum parecer salvo ainda.")
+            else:
+                alunos_avaliados = len(agregados.latest)
+                col_total, col_reprovados, col_ressalvas, col_aprovados = st.columns(4)
+                col_total.metric("Alunos avaliados", alunos_avaliados, help=f"{agregados.records} parecer(es) no total")
+                col_reprovados.metric("Reprovados", agregados.students_by_situation.get(REPROVADO, 0))
+                col_ressalvas.metric("Aprovados com ressalvas", agregados.students_by_situation.get(RESSALVAS, 0))
+                col_aprovados.metric("Aprovados", agregados.students_by_situation.get(APROVADO, 0))
+                st.caption("Situação e níveis consideram o parecer mais recente de cada aluno.")
+                if agregados.students_by_situation.get(NO_LEVELS):
+                    st.caption(f"{agregados.students_by_situation[NO_LEVELS]} aluno(s) só com parecer no formato antigo (sem níveis).")
+
+                st.subheader("Níveis por Característica")
+                st.dataframe(
+                    [
+                        {"Característica": caracteristica["rotulo_curto"], **{nivel: agregados.levels.get(caracteristica["chave"], {}).get(nivel, 0) for nivel in rubric.levels}}
+                        for caracteristica in rubric.characteristics
+                    ],
+                    hide_index=True
+                )
+
+                col_professor, col_mes = st.columns(2)
+                with col_professor:
+                    st.subheader("Por Professor")
+                    st.dataframe(
+                        [{"Professor": professor, "Pareceres": total} for professor, total in sorted(agregados.by_professor.items())],
+                        hide_index=True
+                    )
+                with col_mes:
+                    st.subheader("Por Mês")
+                    st.dataframe(
+                        [{"Mês": mes, "Pareceres": total} for mes, total in sorted(agregados.by_month.items(), reverse=True)],
+                        hide_index=True
+                    )
+                meses = sorted(agregados.by_month, reverse=True)
+                with st.expander("Pareceres por professor e mês"):
+                    st.dataframe(
+                        [{"Professor": professor, **{mes: por_mes.get(mes, 0) for mes in meses}} for professor, por_mes in sorted(agregados.by_professor_month.items())],
+                        hide_index=True
+                    )
+
+        with aba_desempenho:
+            st.subheader("Tempo das Etapas")
+            st.caption(f"Medições deste processo desde {datetime.fromtimestamp(metrics.started).strftime('%d/%m/%Y %H:%M:%S')}; percentis das últimas {metrics.window} medições de cada etapa. Exportado para '{METRICS_FILE}'.")
+            resumo_etapas = metrics.snapshot()
+            if not resumo_etapas:
+                st.info("Nenhuma medição ainda.")
+            else:
+                st.dataframe(
+                    [{
+                        "Etapa": e["etapa"], "Execuções": e["total"], "Média (ms)": round(e["media_ms"], 2),
+                        "p50 (ms)": round(e["p50_ms"], 2), "p90 (ms)": round(e["p90_ms"], 2),
+                        "p99 (ms)": round(e["p99_ms"], 2), "Máx. (ms)": round(e["max_ms"], 2),
+                    } for e in resumo_etapas],
+                    hide_index=True
+                )
+            cache_stats = template_cache.stats()
+            st.caption(f"Cache de templates: {cache_stats['hits']} acertos, {cache_stats['misses']} falhas, {cache_stats['entries']} template(s) em memória.")
+            render_stats = renderer.stats()
+            st.caption(f"DOCX refeitos sob demanda: {render_stats['hits']} do cache, {render_stats['misses']} renderizados, {render_stats['entries']} em memória, {render_stats['mismatches']} com conteúdo diferente do original.")
 
     st.markdown("---")
     st.info("Sistema desenvolvido com Streamlit e Python.")
+
+# Tempo total desta execução; o arquivo do Prometheus é regravado no máximo a cada 15 s
+metrics.observe("script.execucao", time.perf_counter() - _script_start)
+metrics.export(METRICS_FILE)
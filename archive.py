@@ -0,0 +1,280 @@
+import json
+import os
+import struct
+import sys
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+
+from aggregates import Aggregates
+from parecer_text import rubric
+from pareceres_store import index_fields, same_parecer
+from semesters import current_semester, record_semester
+
+FORMAT_VERSION = 1
+MAGIC = b"PARECARQ"
+FOOTER = struct.Struct("<QQ8s")  # offset e tamanho do índice, assinatura do formato
+BLOCK_RECORDS = 128  # pareceres por bloco comprimido
+ARCHIVE_PREFIX = "pareceres_"
+ARCHIVE_SUFFIX = ".arquivo"
+
+
+def archive_path(archive_dir, semester):
+    return os.path.join(archive_dir, f"{ARCHIVE_PREFIX}{semester}{ARCHIVE_SUFFIX}")
+
+
+def _index_entry(record, record_id, block, line):
+    entry = index_fields(record)
+    entry["semestre"] = record_semester(record)
+    entry["id"] = record_id
+    entry["bloco"] = block
+    entry["linha"] = line
+    return entry
+
+
+class SemesterArchive:
+    """
+    Pareceres de um semestre encerrado, em um arquivo comprimido e somente leitura.
+
+    Os registros completos ficam em blocos de até `BLOCK_RECORDS` linhas JSON
+    comprimidas com zlib, seguidos do índice (também comprimido) e de um rodapé
+    de tamanho fixo com a posição do índice. O índice tem os metadados leves de
+    cada parecer (como o índice do `PareceresStore`), a posição dos blocos e os
+    agregados do semestre. Abrir o arquivo lê só o rodapé e o índice; `get`
+    descomprime apenas o bloco do parecer pedido (com um pequeno LRU de blocos).
+
+    A API de leitura é a mesma do `PareceresStore` (`entries`, `students`,
+    `dates`, `query`, `len`, `get`, `find`), para que a tela do administrador
+    trate o semestre ativo e os arquivados do mesmo jeito.
+    """
+
+    def __init__(self, path, max_blocks=4):
+        self.path = path
+        self.max_blocks = max_blocks
+        self._blocks_cache = OrderedDict()  # número do bloco -> linhas
+        self._lock = threading.Lock()
+        with open(path, "rb") as f:
+            f.seek(-FOOTER.size, os.SEEK_END)
+            index_offset, index_length, magic = FOOTER.unpack(f.read(FOOTER.size))
+            if magic != MAGIC:
+                raise ValueError(f"'{path}' não é um arquivo de pareceres.")
+            f.seek(index_offset)
+            index = json.loads(zlib.decompress(f.read(index_length)))
+        if index.get("versao") != FORMAT_VERSION:
+            raise ValueError(f"Versão do arquivo '{path}' não suportada: {index.get('versao')}.")
+        self.semester = index["semestre"]
+        self._blocks = index["blocos"]  # [offset, tamanho] de cada bloco
+        self._entries = index["entradas"]
+        self._aggregates = index["agregados"]
+        self._by_student = {}
+        self._by_date = {}
+        self._by_uid = {}
+        for entry in self._entries:
+            if entry.get("uid"):
+                self._by_uid[entry["uid"]] = entry["id"]
+            if entry.get("student_name"):
+                self._by_student.setdefault(entry["student_name"], []).append(entry["id"])
+            if entry.get("data"):
+                self._by_date.setdefault(entry["data"][:10], []).append(entry["id"])
+
+    # --- Mesma API de leitura do PareceresStore ---
+    def entries(self, start=0):
+        return self._entries[start:]
+
+    def students(self):
+        return sorted(self._by_student)
+
+    def dates(self):
+        return sorted(self._by_date, reverse=True)
+
+    def query(self, student_name=None, date=None, offset=0, limit=None):
+        if student_name and date:
+            day_ids = set(self._by_date.get(date, ()))
+            ids = [i for i in self._by_student.get(student_name, ()) if i in day_ids]
+        elif student_name:
+            ids = self._by_student.get(student_name, [])
+        elif date:
+            ids = self._by_date.get(date, [])
+        else:
+            ids = range(len(self._entries))
+        page = ids[offset:offset + limit] if limit is not None else ids[offset:]
+        return len(ids), [self._entries[i] for i in page]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _block(self, number):
+        with self._lock:
+            lines = self._blocks_cache.get(number)
+            if lines is not None:
+                self._blocks_cache.move_to_end(number)
+                return lines
+        offset, length = self._blocks[number]
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            lines = zlib.decompress(f.read(length)).decode("utf-8").split("\n")
+        with self._lock:
+            self._blocks_cache[number] = lines
+            while len(self._blocks_cache) > self.max_blocks:
+                self._blocks_cache.popitem(last=False)
+        return lines
+
+    def get(self, record_id):
+        """Registro completo (com o payload) de um parecer, descomprimindo só o bloco dele."""
+        entry = self._entries[record_id]
+        return json.loads(self._block(entry["bloco"])[entry["linha"]])
+
+    def find(self, entry):
+        """Registro completo do parecer de `entry` ou None (mesma busca de `PareceresStore.find`)."""
+        if entry.get("uid"):
+            candidates = [self._by_uid.get(entry["uid"])]
+        else:
+            candidates = [entry.get("id")] + self._by_student.get(entry.get("student_name"), [])
+        for i in candidates:
+            if i is not None and i < len(self._entries) and same_parecer(self._entries[i], entry):
+                return self.get(i)
+        return None
+
+    def records(self):
+        """Todos os registros completos, bloco a bloco, na ordem de gravação."""
+        for number in range(len(self._blocks)):
+            for line in self._block(number):
+                yield json.loads(line)
+
+    def aggregates(self):
+        """Agregados do semestre (refeitos do índice se a rubrica mudou desde o arquivamento)."""
+        if self._aggregates.get("rubrica_sha256") == rubric.digest:
+            return Aggregates(self._aggregates)
+        aggregates = Aggregates()
+        for entry in self._entries:
+            aggregates.add(entry)
+        return aggregates
+
+
+def write_archive(path, semester, records):
+    """
+    Grava `records` (registros completos) como o arquivo do semestre. Se já existir
+    um arquivo do semestre, os pareceres dele vêm primeiro e registros idênticos
+    não são repetidos. O arquivo é gravado ao lado e trocado com `os.replace`.
+    Retorna o número de pareceres do arquivo.
+    """
+    seen, merged = set(), []
+    existing = SemesterArchive(path).records() if os.path.exists(path) else ()
+    for source in (existing, records):
+        for record in source:
+            line = json.dumps(record, ensure_ascii=False, sort_keys=True)
+            if line not in seen:
+                seen.add(line)
+                merged.append((record, line))
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    blocks, entries, aggregates = [], [], Aggregates()
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for start in range(0, len(merged), BLOCK_RECORDS):
+                chunk = merged[start:start + BLOCK_RECORDS]
+                for line_number, (record, _) in enumerate(chunk):
+                    entry = _index_entry(record, len(entries), len(blocks), line_number)
+                    entries.append(entry)
+                    aggregates.add(entry)
+                payload = zlib.compress("\n".join(line for _, line in chunk).encode("utf-8"), 9)
+                blocks.append([f.tell(), len(payload)])
+                f.write(payload)
+            index = zlib.compress(json.dumps({
+                "versao": FORMAT_VERSION,
+                "semestre": semester,
+                "registros": len(entries),
+                "blocos": blocks,
+                "entradas": entries,
+                "agregados": aggregates.to_dict(),
+            }, ensure_ascii=False).encode("utf-8"), 9)
+            index_offset = f.tell()
+            f.write(index)
+            f.write(FOOTER.pack(index_offset, len(index), MAGIC))
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(entries)
+
+
+class ArchiveSet:
+    """
+    Arquivos dos semestres encerrados em `archive_dir`. A lista é refeita só
+    quando a pasta muda, e cada arquivo aberto (índice em memória) é reaproveitado
+    enquanto não for regravado.
+    """
+
+    def __init__(self, archive_dir):
+        self.archive_dir = archive_dir
+        self._listing = (None, {})  # (mtime da pasta, semestre -> caminho)
+        self._open = {}  # caminho -> (mtime_ns, SemesterArchive)
+        self._lock = threading.Lock()
+
+    def _paths(self):
+        mtime = os.stat(self.archive_dir).st_mtime_ns if os.path.isdir(self.archive_dir) else None
+        if mtime != self._listing[0]:
+            paths = {}
+            if mtime is not None:
+                for item in os.scandir(self.archive_dir):
+                    if item.name.startswith(ARCHIVE_PREFIX) and item.name.endswith(ARCHIVE_SUFFIX):
+                        paths[item.name[len(ARCHIVE_PREFIX):-len(ARCHIVE_SUFFIX)]] = item.path
+            self._listing = (mtime, paths)
+        return self._listing[1]
+
+    def semesters(self):
+        """Semestres arquivados, do mais recente para o mais antigo."""
+        with self._lock:
+            return sorted(self._paths(), reverse=True)
+
+    def open(self, semester):
+        with self._lock:
+            path = self._paths().get(semester)
+            if path is None:
+                raise KeyError(semester)
+            mtime = os.stat(path).st_mtime_ns
+            cached = self._open.get(path)
+            if cached is None or cached[0] != mtime:
+                cached = self._open[path] = (mtime, SemesterArchive(path))
+            return cached[1]
+
+
+def archive_closed_semesters(store, archive_dir, semester):
+    """
+    Move os pareceres dos semestres diferentes de `semester` do store para os
+    arquivos dos seus semestres e compacta o store. Os arquivos são gravados com
+    o store travado e antes da troca dos arquivos do store: se algo falhar no
+    meio, os pareceres continuam no store (e um novo arquivamento não os duplica).
+    Retorna {semestre: pareceres movidos}.
+    """
+    moved = {}
+
+    def write_archives(removed):
+        by_semester = {}
+        for record in removed:
+            by_semester.setdefault(record_semester(record), []).append(record)
+        for closed, records in sorted(by_semester.items()):
+            write_archive(archive_path(archive_dir, closed), closed, records)
+            moved[closed] = len(records)
+
+    store.compact(lambda record: record_semester(record) == semester, write_archives)
+    return moved
+
+
+if __name__ == "__main__":
+    # Uso: python archive.py [data/pareceres.jsonl] [data/arquivo] [semestre atual]
+    from pareceres_store import PareceresStore
+
+    jsonl_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join("data", "pareceres.jsonl")
+    archive_dir = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(jsonl_path), "arquivo")
+    semester = current_semester(sys.argv[3] if len(sys.argv) > 3 else None)
+    moved = archive_closed_semesters(PareceresStore(jsonl_path), archive_dir, semester)
+    for closed, count in moved.items():
+        print(f"{count} parecer(es) de {closed} arquivado(s) em {archive_path(archive_dir, closed)}.")
+    print(f"Semestre ativo: {semester}; {sum(moved.values())} parecer(es) arquivado(s).")
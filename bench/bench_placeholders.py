@@ -0,0 +1,91 @@
+"""
+Compara o tempo de substituição de placeholders do método antigo (uma chamada
+por parágrafo x placeholder) com o `fill_placeholders` de passagem única, nos
+templates reais. Também confere que o XML gerado pelos dois é idêntico (exceto
+em templates com placeholders em caixas de texto, como o `template_base.docx`,
+que o método antigo não preenchia).
+
+Uso: python bench/bench_placeholders.py [padrão_glob_dos_templates]
+"""
+import copy
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+from placeholders import fill_placeholders
+
+REPLACEMENTS = {
+    "{{NOME_ALUNO}}": "Aluno Exemplo",
+    "{{PARECER_GERADO}}": "Primeiro parágrafo.\n\nSegundo parágrafo.",
+    "{{NOME_PROFESSOR}}": "professor1",
+    "{{NOME_COORDENADOR}}": "Coordenador",
+    "{{DATA_PARECER}}": "01/07/2025",
+    "{{DIA_PARECER}}": "01",
+    "{{MES_PARECER}}": "Julho",
+    "{{ANO_CORRENTE}}": "2025",
+    "{{SEMESTRE}}": "2025.1",
+}
+
+
+def legacy_fill(document, replacements):
+    """Implementação anterior de gerar_docx_parecer, mantida aqui só para comparação."""
+    def replace_and_format_paragraph(paragraph, old_text, new_text):
+        full_paragraph_text = "".join(run.text for run in paragraph.runs)
+        if old_text in full_paragraph_text:
+            for i in range(len(paragraph.runs) - 1, -1, -1):
+                paragraph._element.remove(paragraph.runs[i]._element)
+            new_run = paragraph.add_run(new_text)
+            if old_text == "{{PARECER_GERADO}}":
+                paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+                new_run.font.name = "Times New Roman"
+
+    for paragraph in document.paragraphs:
+        for key, value in replacements.items():
+            replace_and_format_paragraph(paragraph, key, value)
+    for table in document.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                for paragraph in cell.paragraphs:
+                    for key, value in replacements.items():
+                        replace_and_format_paragraph(paragraph, key, value)
+
+
+def main():
+    pattern = sys.argv[1] if len(sys.argv) > 1 else os.path.join("data", "template_*.docx")
+    files = sorted(glob.glob(pattern)) or sorted(glob.glob("template_*.docx"))
+    if not files:
+        print(f"Nenhum template encontrado em '{pattern}'.")
+        return
+
+    legacy_total = single_total = 0.0
+    for path in files:
+        template = Document(path)
+        legacy_doc, single_doc = copy.deepcopy(template), copy.deepcopy(template)
+
+        start = time.perf_counter()
+        legacy_fill(legacy_doc, REPLACEMENTS)
+        legacy_total += time.perf_counter() - start
+
+        start = time.perf_counter()
+        fill_placeholders(single_doc, REPLACEMENTS)
+        single_total += time.perf_counter() - start
+
+        in_text_box = template.element.body.xpath('.//w:txbxContent//w:t[contains(., "{{")]')
+        if not in_text_box and legacy_doc.element.xml != single_doc.element.xml:
+            print(f"AVISO: resultado diferente do método antigo em {path}")
+
+    n = len(files)
+    print(f"{n} template(s)")
+    print(f"método antigo:    {legacy_total / n * 1000:.2f} ms/documento")
+    print(f"passagem única:   {single_total / n * 1000:.2f} ms/documento")
+    print(f"ganho:            {legacy_total / single_total:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Mede o tempo da primeira execução do app.py e dos reruns (cada interação com
+um widget reexecuta o script inteiro), com um histórico sintético de pareceres.
+Roda o app com o AppTest do Streamlit, sem servidor.
+
+Uso: python bench/bench_startup.py [numero_de_pareceres] [numero_de_reruns]
+"""
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_history(data_dir, n_records):
+    from pareceres_store import PareceresStore
+
+    store = PareceresStore(os.path.join(data_dir, "pareceres.jsonl"))
+    levels = ["Bom", "Ótimo", "Regular", "Ruim"]
+    store.append_many([
+        {
+            "student_name": f"Aluno {i % 500:03d}",
+            "data": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d} 10:00:00",
+            "professor": f"professor{1 + i % 3}",
+            "characteristics_levels": {
+                "comportamento": levels[i % 4],
+                "participacao": levels[(i // 4) % 4],
+                "leitura_escrita": levels[(i // 16) % 4],
+                "matematica": levels[(i // 64) % 4],
+            },
+            "docx_sha256": f"{i:064x}",
+        }
+        for i in range(n_records)
+    ])
+
+
+def main():
+    n_records = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    n_reruns = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    workdir = tempfile.mkdtemp(prefix="bench_startup_")
+    data_dir = os.path.join(workdir, "data")
+    os.makedirs(data_dir)
+    shutil.copy(os.path.join(ROOT, "users.json"), data_dir)
+    make_history(data_dir, n_records)
+    os.chdir(workdir)
+
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    import_streamlit = time.perf_counter() - start
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    start = time.perf_counter()
+    at.run()
+    first_run = time.perf_counter() - start
+
+    at.text_input(key="login_user").input("admin")
+    at.text_input(key="login_pass").input("adminpass")
+    at.button(key="login_button").click().run()
+
+    reruns = []
+    for _ in range(n_reruns):
+        start = time.perf_counter()
+        at.run()
+        reruns.append(time.perf_counter() - start)
+
+    print(f"histórico: {n_records} pareceres")
+    print(f"import do streamlit:   {import_streamlit * 1000:8.1f} ms")
+    print(f"primeira execução:     {first_run * 1000:8.1f} ms")
+    print(f"rerun (admin), média:  {statistics.mean(reruns) * 1000:8.1f} ms")
+    print(f"rerun (admin), p95:    {sorted(reruns)[int(len(reruns) * 0.95) - 1] * 1000:8.1f} ms")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+Suíte de benchmarks dos caminhos críticos do app, sem servidor do Streamlit:
+
+- texto:      generate_detailed_parecer_text (com e sem o cache de combinações)
+- docx:       preenchimento do template base com os dados do cadastro (alunos.json)
+- migracao:   leitura do antigo pareceres.json (com DOCX em hex) e gravação no store
+- carga:      abertura a frio do store (leitura do índice)
+- gravacao:   save de um parecer pelo GroupCommitWriter (append + fsync)
+- listagem:   consultas da tela do administrador (sem filtro, por aluno, por data)
+- download:   leitura do DOCX de um parecer no blob store
+
+Cada etapa que depende do tamanho do histórico roda com históricos sintéticos
+de 100, 1k, 10k e 50k pareceres. Para cada etapa são registrados os
+percentis de latência, o pico de memória (tracemalloc, em uma execução
+separada para não distorcer os tempos) e o tamanho dos arquivos em disco.
+O resultado vai para um JSON (por padrão `bench/results/<commit>.json`) que
+pode ser comparado com o de outro commit usando `--compare`.
+
+Uso: python bench/bench_suite.py [--sizes 100,1000,10000,50000] [--samples 200]
+                                 [--output arquivo.json] [--compare anterior.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from blob_store import BlobStore, externalize_docx
+from parecer_docx import build_replacements, render_parecer_docx
+from parecer_text import generate_detailed_parecer_text, rubric
+from pareceres_store import GroupCommitWriter, PareceresStore, migrate_from_json
+from roster import load_roster, roster_replacements, sanitize_student_name_for_filename
+
+DEFAULT_SIZES = (100, 1000, 10000, 50000)
+# Registros do pareceres.json sintético que carregam o DOCX em hex (como no formato antigo)
+LEGACY_DOCX_RECORDS = 20
+# DOCX distintos no blob store; os registros do histórico apontam para eles
+DISTINCT_BLOBS = 20
+
+
+def find_file(name):
+    for path in (os.path.join(ROOT, "data", name), os.path.join(ROOT, name)):
+        if os.path.exists(path):
+            return path
+    sys.exit(f"Arquivo '{name}' não encontrado em data/ nem na raiz do repositório.")
+
+
+def percentile(sorted_values, p):
+    # Percentil pelo método do posto mais próximo
+    index = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies):
+    values = sorted(latencies)
+    return {
+        "n": len(values),
+        "mean_ms": sum(values) / len(values) * 1000,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p90_ms": percentile(values, 90) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": values[-1] * 1000,
+    }
+
+
+def peak_memory(fn):
+    """Pico de memória alocada (KiB) durante uma chamada de `fn`."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def measure(calls, setup=None):
+    """Mede cada chamada de `calls` (lista de funções sem argumentos). Retorna as latências."""
+    latencies = []
+    for call in calls:
+        if setup:
+            setup()
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def dir_size(path):
+    total = 0
+    for folder, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(folder, f)) for f in files)
+    return total
+
+
+def random_levels(rng):
+    return {key: rng.choice(rubric.levels) for key in rubric.keys}
+
+
+def synthetic_records(n_records, students, digests, rng):
+    records = []
+    for i in range(n_records):
+        records.append({
+            "student_name": students[i % len(students)],
+            "data": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:00",
+            "professor": f"professor{1 + i % 3}",
+            "characteristics_levels": random_levels(rng),
+            "docx_sha256": digests[i % len(digests)],
+        })
+    return records
+
+
+class Suite:
+    def __init__(self, samples, seed=42):
+        self.samples = samples
+        self.rng = random.Random(seed)
+        self.results = []
+        self.files = {}
+        self.template = find_file("template_base.docx")
+        self.roster = load_roster(find_file("alunos.json"))
+        # Só as chaves principais (os aliases apontam para os mesmos alunos)
+        self.students = sorted({entry["nome"] for entry in self.roster.values()})
+
+    def record(self, stage, n_records, latencies, peak_kib):
+        summary = {"stage": stage, "records": n_records, **summarize(latencies), "peak_kib": peak_kib}
+        self.results.append(summary)
+        records = "-" if n_records is None else n_records
+        print(f"{stage:<22} {records:>7} {summary['p50_ms']:>10.3f} {summary['p90_ms']:>10.3f} "
+              f"{summary['p99_ms']:>10.3f} {summary['max_ms']:>10.3f} {peak_kib:>11.1f}")
+
+    def replacements_for(self, student_name):
+        entry = self.roster[sanitize_student_name_for_filename(student_name)]
+        text = generate_detailed_parecer_text(random_levels(self.rng), student_name)
+        replacements = build_replacements(student_name, text, "professor1", "Coordenador")
+        replacements.update(roster_replacements(entry))
+        return replacements
+
+    # --- Etapas que não dependem do tamanho do histórico ---
+
+    def bench_text(self):
+        combos = [(random_levels(self.rng), self.rng.choice(self.students)) for _ in range(self.samples)]
+        calls = [lambda c=c: generate_detailed_parecer_text(*c) for c in combos]
+        cold = measure(calls, setup=_clear_text_cache)
+        _clear_text_cache()
+        self.record("texto (frio)", None, cold, peak_memory(lambda: [c() for c in calls]))
+        self.record("texto (cache)", None, measure(calls), peak_memory(lambda: [c() for c in calls]))
+
+    def bench_docx(self):
+        n = max(10, self.samples // 10)
+        replacements = [self.replacements_for(self.rng.choice(self.students)) for _ in range(n)]
+        render_parecer_docx(self.template, replacements[0])  # aquece o cache de templates
+        calls = [lambda r=r: render_parecer_docx(self.template, r) for r in replacements]
+        self.record("docx", None, measure(calls), peak_memory(calls[0]))
+        self.files["template_base.docx"] = os.path.getsize(self.template)
+
+    # --- Etapas por tamanho do histórico ---
+
+    def make_blobs(self, blob_store):
+        docs = [render_parecer_docx(self.template, self.replacements_for(s)) for s in self.students[:DISTINCT_BLOBS]]
+        return docs, [blob_store.put(d) for d in docs]
+
+    def bench_size(self, n_records, workdir):
+        data_dir = os.path.join(workdir, f"n{n_records}")
+        os.makedirs(data_dir)
+        blob_store = BlobStore(os.path.join(data_dir, "blobs"))
+        docs, digests = self.make_blobs(blob_store)
+        records = synthetic_records(n_records, self.students, digests, self.rng)
+
+        # Antigo pareceres.json: lista completa, alguns registros com o DOCX em hex
+        legacy_path = os.path.join(data_dir, "pareceres.json")
+        legacy = [dict(r) for r in records]
+        for i, record in enumerate(legacy[:LEGACY_DOCX_RECORDS]):
+            del record["docx_sha256"]
+            record["docx_data"] = docs[i % len(docs)].hex()
+        with open(legacy_path, "w", encoding="utf-8") as f:
+            json.dump(legacy, f, indent=4, ensure_ascii=False)
+        legacy_size = os.path.getsize(legacy_path)
+        shutil.copy(legacy_path, legacy_path + ".orig")
+
+        log_path = os.path.join(data_dir, "pareceres.jsonl")
+
+        def migrate():
+            for path in (log_path, os.path.splitext(log_path)[0] + ".idx"):
+                if os.path.exists(path):
+                    os.remove(path)
+            shutil.copy(legacy_path + ".orig", legacy_path)
+            migrate_from_json(legacy_path, PareceresStore(log_path), lambda r: externalize_docx(r, blob_store))
+
+        self.record("migracao", n_records, measure([migrate] * 3), peak_memory(migrate))
+
+        def cold_load():
+            return len(PareceresStore(log_path))
+
+        self.record("carga", n_records, measure([cold_load] * 5), peak_memory(cold_load))
+
+        store = PareceresStore(log_path)
+        len(store)  # a carga do índice já foi medida acima
+        writer = GroupCommitWriter(store)
+        new_records = synthetic_records(self.samples, self.students, digests, self.rng)
+        save_calls = [lambda r=r: writer.write(r) for r in new_records]
+        latencies = measure(save_calls)
+        writer.close()
+        extra = synthetic_records(1, self.students, digests, self.rng)[0]
+        self.record("gravacao", n_records, latencies, peak_memory(lambda: store.append(extra)))
+
+        page = 10
+        total = len(store)
+        dates = store.dates()
+        listing = {
+            "listagem (pagina)": [lambda o=self.rng.randrange(0, total, page): store.query(offset=o, limit=page)
+                                  for _ in range(self.samples)],
+            "listagem (aluno)": [lambda s=self.rng.choice(self.students): store.query(student_name=s, offset=0, limit=page)
+                                 for _ in range(self.samples)],
+            "listagem (data)": [lambda d=self.rng.choice(dates): store.query(date=d, offset=0, limit=page)
+                                for _ in range(self.samples)],
+        }
+        for stage, calls in listing.items():
+            self.record(stage, n_records, measure(calls), peak_memory(calls[0]))
+
+        entries = store.entries()
+        download_calls = [lambda e=self.rng.choice(entries): blob_store.read(e["docx_sha256"])
+                          for _ in range(self.samples)]
+        self.record("download", n_records, measure(download_calls), peak_memory(download_calls[0]))
+
+        self.files[str(n_records)] = {
+            "pareceres.json (antigo)": legacy_size,
+            "pareceres.jsonl": os.path.getsize(log_path),
+            "pareceres.idx": os.path.getsize(store.index_path),
+            "blobs": dir_size(blob_store.root),
+        }
+
+
+def _clear_text_cache():
+    from parecer_text import _render_cached
+    _render_cached.cache_clear()
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+
+
+def compare(current, previous_path):
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    old = {(r["stage"], r["records"]): r for r in previous["results"]}
+    print(f"\nComparação com {previous.get('commit', '?')} (p50):")
+    for result in current["results"]:
+        before = old.get((result["stage"], result["records"]))
+        if not before:
+            continue
+        change = (result["p50_ms"] / before["p50_ms"] - 1) * 100 if before["p50_ms"] else 0.0
+        records = "-" if result["records"] is None else result["records"]
+        print(f"{result['stage']:<22} {records:>7} {before['p50_ms']:>10.3f} -> {result['p50_ms']:>10.3f} ms ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de geração, gravação e listagem dos pareceres.")
+    parser.add_argument("--sizes", default=",".join(str(n) for n in DEFAULT_SIZES),
+                        help="tamanhos do histórico sintético, separados por vírgula")
+    parser.add_argument("--samples", type=int, default=200, help="amostras por etapa")
+    parser.add_argument("--output", help="arquivo JSON de saída (padrão: bench/results/<commit>.json)")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    output = args.output or os.path.join(ROOT, "bench", "results", f"{commit}.json")
+    suite = Suite(args.samples)
+
+    print(f"{'etapa':<22} {'regs':>7} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'max ms':>10} {'pico KiB':>11}")
+    suite.bench_text()
+    suite.bench_docx()
+    workdir = tempfile.mkdtemp(prefix="bench_suite_")
+    try:
+        for n_records in (int(s) for s in args.sizes.split(",") if s.strip()):
+            suite.bench_size(n_records, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("\nTamanho dos arquivos (bytes):")
+    for key, value in suite.files.items():
+        if isinstance(value, dict):
+            print(f"  {key} registros: " + ", ".join(f"{name}={size}" for name, size in value.items()))
+        else:
+            print(f"  {key}: {value}")
+
+    result = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "samples": args.samples,
+        "results": suite.results,
+        "files": suite.files,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=4, ensure_ascii=False)
+    print(f"\nResultado gravado em {output}")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
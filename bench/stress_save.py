@@ -0,0 +1,153 @@
+"""
+Teste de estresse da gravação de pareceres: N sessões (threads) salvando ao mesmo
+tempo, e opcionalmente vários processos com o mesmo arquivo. Compara o
+GroupCommitWriter (um append + fsync por lote) com appends individuais e confere
+que nenhum registro foi perdido ou duplicado, inclusive depois de uma queda no
+meio de um append.
+
+Uso: python bench/stress_save.py [sessoes] [saves_por_sessao] [processos]
+"""
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pareceres_store import GroupCommitWriter, PareceresStore
+
+
+def make_record(process, session, n):
+    return {
+        "student_name": f"Aluno {session:03d}",
+        "data": "2025-06-30 10:00:00",
+        "professor": f"proc{process}-sessao{session}",
+        "characteristics_levels": {"comportamento": "Bom", "participacao": "Bom", "leitura_escrita": "Regular", "matematica": "Bom"},
+        "docx_sha256": f"{process:08x}{session:08x}{n:048x}",
+    }
+
+
+def run_sessions(save, n_sessions, saves_per_session, process=0):
+    """Dispara as sessões em threads; retorna (duração total, latências de cada save)."""
+    latencies = []
+    latencies_lock = threading.Lock()
+    barrier = threading.Barrier(n_sessions)
+
+    def session(session_id):
+        local = []
+        barrier.wait()
+        for n in range(saves_per_session):
+            start = time.perf_counter()
+            save(make_record(process, session_id, n))
+            local.append(time.perf_counter() - start)
+        with latencies_lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(n_sessions)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, latencies
+
+
+def _process_main(data_path, n_sessions, saves_per_session, process):
+    writer = GroupCommitWriter(PareceresStore(data_path))
+    run_sessions(writer.write, n_sessions, saves_per_session, process)
+    writer.close()
+
+
+def check(data_path, expected):
+    """Relê o arquivo do zero e confere contagem, unicidade e integridade dos registros."""
+    store = PareceresStore(data_path)
+    entries = store.entries()
+    keys = [e["docx_sha256"] for e in entries]
+    assert len(entries) == len(expected), f"esperados {len(expected)} registros, encontrados {len(entries)}"
+    assert set(keys) == expected, "registros perdidos ou inesperados"
+    assert len(set(keys)) == len(keys), "registros duplicados"
+    for entry in entries[:: max(1, len(entries) // 100)]:
+        assert store.get(entry["id"])["docx_sha256"] == entry["docx_sha256"], "offset inconsistente"
+
+
+def crash_check(workdir):
+    """
+    Simula quedas no meio de um append (linha incompleta no fim dos dados ou do
+    índice) e confere que o store continua legível e gravável depois de reaberto.
+    """
+    for name, suffix in (("queda_dados", ".jsonl"), ("queda_indice", ".idx")):
+        path = os.path.join(workdir, f"{name}.jsonl")
+        PareceresStore(path).append_many([make_record(0, 0, n) for n in range(3)])
+        with open(os.path.splitext(path)[0] + suffix, "ab") as f:
+            f.write(b'{"student_name": "Aluno inte')
+        PareceresStore(path).append(make_record(0, 0, 3))
+        for _ in range(2):  # a segunda abertura lê o índice já reparado
+            check(path, {make_record(0, 0, n)["docx_sha256"] for n in range(4)})
+
+
+def report(label, duration, latencies, total):
+    latencies = sorted(latencies)
+    print(f"{label:<22} {total / duration:9.0f} saves/s   "
+          f"p50 {statistics.median(latencies) * 1000:7.2f} ms   "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:7.2f} ms")
+
+
+def main():
+    n_sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    saves_per_session = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    n_processes = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    total = n_sessions * saves_per_session
+    expected = {make_record(0, s, n)["docx_sha256"] for s in range(n_sessions) for n in range(saves_per_session)}
+    workdir = tempfile.mkdtemp(prefix="stress_save_")
+    print(f"{n_sessions} sessões x {saves_per_session} saves")
+
+    try:
+        # Append direto: cada save faz o próprio append + fsync
+        path = os.path.join(workdir, "direto.jsonl")
+        store = PareceresStore(path)
+        duration, latencies = run_sessions(store.append, n_sessions, saves_per_session)
+        check(path, expected)
+        report("append individual", duration, latencies, total)
+
+        # Escritor único com group commit
+        path = os.path.join(workdir, "group_commit.jsonl")
+        writer = GroupCommitWriter(PareceresStore(path))
+        duration, latencies = run_sessions(writer.write, n_sessions, saves_per_session)
+        writer.close()
+        check(path, expected)
+        report("group commit", duration, latencies, total)
+        print(f"{'':<22} {writer.records} registros em {writer.batches} lotes")
+
+        # Vários processos (ex.: mais de um servidor) gravando no mesmo arquivo
+        if n_processes > 1:
+            path = os.path.join(workdir, "processos.jsonl")
+            processes = [
+                multiprocessing.Process(target=_process_main, args=(path, n_sessions, saves_per_session, p))
+                for p in range(n_processes)
+            ]
+            start = time.perf_counter()
+            for p in processes:
+                p.start()
+            for p in processes:
+                p.join()
+            duration = time.perf_counter() - start
+            expected_all = {
+                make_record(p, s, n)["docx_sha256"]
+                for p in range(n_processes) for s in range(n_sessions) for n in range(saves_per_session)
+            }
+            check(path, expected_all)
+            print(f"{n_processes} processos:{'':<11} {total * n_processes / duration:9.0f} saves/s   sem perdas")
+
+        crash_check(workdir)
+        print("Queda no meio do append (dados e índice): store íntegro ao reabrir")
+        print("OK: nenhum registro perdido ou duplicado")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
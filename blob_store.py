@@ -0,0 +1,90 @@
+import hashlib
+import os
+import tempfile
+import zipfile
+from io import BytesIO
+
+
+def content_digest(data):
+    """
+    Hash SHA-256 do conteúdo lógico de um DOCX.
+
+    O python-docx grava no zip a hora da geração de cada membro, então dois
+    documentos idênticos gerados em segundos diferentes têm bytes diferentes.
+    O hash considera apenas o nome e o conteúdo descomprimido de cada membro;
+    para dados que não são zip, usa os bytes crus.
+    """
+    digest = hashlib.sha256()
+    try:
+        with zipfile.ZipFile(BytesIO(data)) as zf:
+            for name in sorted(zf.namelist()):
+                digest.update(name.encode("utf-8") + b"\0")
+                digest.update(zf.read(name))
+    except zipfile.BadZipFile:
+        return hashlib.sha256(data).hexdigest()
+    return digest.hexdigest()
+
+
+class BlobStore:
+    """
+    Armazenamento endereçado por conteúdo para os DOCX gerados.
+
+    Cada blob é gravado uma única vez em `<root>/<hh>/<hash>.docx`, com os bytes
+    crus do documento (sem hex). O hash é o do conteúdo (`content_digest`), então
+    um parecer regerado com conteúdo idêntico aponta para o mesmo arquivo. O DOCX
+    já é um zip comprimido com deflate, por isso os bytes não são comprimidos de
+    novo.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, digest, suffix=".docx"):
+        return os.path.join(self.root, digest[:2], f"{digest}{suffix}")
+
+    def exists(self, digest, suffix=".docx"):
+        return os.path.exists(self.path(digest, suffix))
+
+    def put(self, data, suffix=".docx"):
+        """Grava os bytes (se ainda não existirem) e retorna o hash do conteúdo."""
+        digest = content_digest(data)
+        path = self.path(digest, suffix)
+        if os.path.exists(path):
+            return digest
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Escreve em arquivo temporário e renomeia: o blob nunca aparece pela metade
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest
+
+    def read(self, digest, suffix=".docx"):
+        """Lê os bytes do blob do disco."""
+        with open(self.path(digest, suffix), "rb") as f:
+            return f.read()
+
+
+def externalize_docx(record, blob_store):
+    """
+    Converte um registro no formato antigo (`docx_data` em hex) para o formato
+    com blob: os bytes vão para o `blob_store` e o registro guarda só o hash.
+    """
+    if not record.get("docx_data"):
+        return record
+    try:
+        docx_bytes = bytes.fromhex(record["docx_data"])
+    except ValueError:
+        return record  # Payload corrompido: mantém o registro como está
+    record = {k: v for k, v in record.items() if k != "docx_data"}
+    record["docx_sha256"] = blob_store.put(docx_bytes)
+    return record
@@ -0,0 +1,101 @@
+import csv
+import io
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from blob_store import content_digest
+from parecer_docx import render_parecer_docx
+from parecer_text import rubric
+
+LEVEL_COLUMNS = rubric.keys
+STUDENT_COLUMN = "aluno"
+
+
+def read_levels_csv(data, valid_levels):
+    """
+    Lê a grade de níveis da turma de um CSV com as colunas `aluno` e uma por
+    característica da rubrica (`comportamento,participacao,leitura_escrita,matematica`),
+    separadas por `,` ou `;`.
+    Retorna (linhas, erros); cada linha é um dict com `aluno` e os níveis.
+    """
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    first_line = data.split("\n", 1)[0]
+    delimiter = ";" if first_line.count(";") > first_line.count(",") else ","
+    reader = csv.DictReader(io.StringIO(data), delimiter=delimiter)
+
+    header = [h.strip().lower() for h in (reader.fieldnames or [])]
+    missing = [c for c in (STUDENT_COLUMN,) + LEVEL_COLUMNS if c not in header]
+    if missing:
+        return [], [f"Colunas ausentes no CSV: {', '.join(missing)}"]
+
+    rows, errors = [], []
+    for line_number, raw in enumerate(reader, start=2):
+        row = {k.strip().lower(): (v or "").strip() for k, v in raw.items() if k}
+        if not row.get(STUDENT_COLUMN):
+            continue
+        invalid = [c for c in LEVEL_COLUMNS if row.get(c) not in valid_levels]
+        if invalid:
+            errors.append(f"Linha {line_number} ({row[STUDENT_COLUMN]}): nível inválido em {', '.join(invalid)}")
+            continue
+        rows.append({STUDENT_COLUMN: row[STUDENT_COLUMN], **{c: row[c] for c in LEVEL_COLUMNS}})
+    return rows, errors
+
+
+def _pool_size(n_jobs, max_workers=None):
+    return max(1, min(n_jobs, max_workers or os.cpu_count() or 1))
+
+
+def iter_rendered(jobs, max_workers=None):
+    """
+    Renderiza os DOCX dos `jobs` em paralelo num pool de processos (um por núcleo)
+    e devolve (job, docx_bytes, erro) à medida que cada um termina.
+    Cada job precisa de `template_path` e `replacements`.
+    """
+    if not jobs:
+        return
+    # "spawn" evita herdar por fork as threads do servidor do Streamlit
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=_pool_size(len(jobs), max_workers), mp_context=context) as pool:
+        futures = {pool.submit(render_parecer_docx, job["template_path"], job["replacements"]): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                yield job, future.result(), None
+            except Exception as e:
+                yield job, None, e
+
+
+def generate_batch(jobs, zip_path, blob_store, pareceres_store, max_workers=None, on_progress=None, keep_docx=True):
+    """
+    Gera os pareceres de uma turma inteira.
+
+    Cada DOCX é escrito no ZIP em `zip_path` (e no blob store) assim que fica
+    pronto, sem montar o ZIP inteiro em memória. Os registros são gravados no
+    `pareceres_store` de uma só vez ao final. Cada job traz, além do que
+    `iter_rendered` precisa, `file_name` (nome dentro do ZIP) e `record` (o
+    registro do parecer, sem o DOCX). Com `keep_docx=False` o DOCX não vai para
+    o blob store e o registro guarda só o hash do conteúdo (`docx_digest`), para
+    ser refeito sob demanda.
+    Retorna (registros gravados, lista de (job, erro)).
+    """
+    records, errors = [], []
+    # DOCX já é comprimido: as entradas vão para o ZIP sem nova compressão
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED) as zf:
+        for done, (job, docx_bytes, error) in enumerate(iter_rendered(jobs, max_workers), start=1):
+            if error is not None:
+                errors.append((job, error))
+            else:
+                zf.writestr(job["file_name"], docx_bytes)
+                if keep_docx:
+                    records.append({**job["record"], "docx_sha256": blob_store.put(docx_bytes)})
+                else:
+                    records.append({**job["record"], "docx_digest": content_digest(docx_bytes)})
+            if on_progress:
+                on_progress(done, len(jobs))
+
+    if records:
+        pareceres_store.append_many(records)
+    return records, errors
@@ -0,0 +1,185 @@
+"""
+Converte os templates individuais (`template_<aluno>.docx`) para o formato com um
+único template base (`template_base.docx`) e um cadastro de alunos (`alunos.json`).
+
+Os templates individuais só diferem nos dados pessoais do quadro de identificação
+(nome, filiação, endereço, nascimento, período/turma/turno/número). O conversor
+extrai esses campos de cada arquivo para o cadastro e gera o template base a partir
+de um template com a estrutura da maioria (alguns arquivos têm parágrafos vazios a
+mais), trocando os campos pelos placeholders de `roster.ROSTER_PLACEHOLDERS`.
+
+Uso: python converter_templates.py [pasta_dos_templates] [pasta_de_saida] [template_para_a_base]
+"""
+import copy
+import glob
+import json
+import os
+import re
+import sys
+
+from docx import Document
+from docx.oxml.ns import qn
+
+from roster import ROSTER_PLACEHOLDERS
+
+BASE_TEMPLATE_NAME = "template_base.docx"
+ROSTER_NAME = "alunos.json"
+
+_W_P = qn("w:p")
+_W_R = qn("w:r")
+_W_T = qn("w:t")
+_W_RPR = qn("w:rPr")
+_W_U = qn("w:u")
+
+# Linhas do quadro de identificação: prefixo -> expressão que extrai os campos
+FIELD_PATTERNS = [
+    ("Nome do Aluno", re.compile(r"Nome do Aluno \(a\):\s*(?P<nome>.*)$")),
+    ("Filiação", re.compile(r"Filiação:\s*(?P<filiacao_mae>.*?)\s+e(?:\s+(?P<filiacao_pai>.*))?$")),
+    ("Endereço", re.compile(r"Endereço:\s*(?P<endereco>.*?)\s*UF:\s*(?P<uf>.*)$")),
+    ("Data de Nascimento", re.compile(
+        r"Data de Nascimento:\s*(?P<dia>\d+)\s*/\s*(?P<mes>\d+)\s*/\s*(?P<ano>\d+)\s*Naturalidade:\s*(?P<naturalidade>.*)$")),
+    ("Período", re.compile(
+        r"Período\s*:\s*(?P<periodo>\S+?)\s*Turma:\s*(?P<turma>.*?)\s*Turno:\s*(?P<turno>.*?)\s*"
+        r"Nº\s*(?P<numero>\S+)\s*Ano Letivo:\s*(?P<ano_letivo>\S+)\s*Semestre:\s*(?P<semestre>\S+)")),
+]
+
+# Como cada linha fica no template base: (texto, é valor sublinhado?)
+BASE_LINES = {
+    "Nome do Aluno": [("Nome do Aluno (a): ", False), (" {{NOME_ALUNO}} ", True)],
+    "Filiação": [
+        ("Filiação: ", False), (f" {ROSTER_PLACEHOLDERS['filiacao_mae']} ", True),
+        (" e ", False), (f" {ROSTER_PLACEHOLDERS['filiacao_pai']} ", True),
+    ],
+    "Endereço": [
+        ("Endereço: ", False), (f" {ROSTER_PLACEHOLDERS['endereco']} ", True),
+        ("   UF: ", False), (f" {ROSTER_PLACEHOLDERS['uf']} ", True),
+    ],
+    "Data de Nascimento": [
+        ("Data de Nascimento: ", False), (f" {ROSTER_PLACEHOLDERS['data_nascimento']} ", True),
+        ("   Naturalidade: ", False), (f" {ROSTER_PLACEHOLDERS['naturalidade']} ", True),
+    ],
+    "Período": [
+        ("Período: ", False), (f" {ROSTER_PLACEHOLDERS['periodo']} ", True),
+        ("   Turma: ", False), (f" {ROSTER_PLACEHOLDERS['turma']} ", True),
+        ("   Turno: ", False), (f" {ROSTER_PLACEHOLDERS['turno']} ", True),
+        ("   Nº ", False), (f" {ROSTER_PLACEHOLDERS['numero']} ", True),
+        ("   Ano Letivo: ", False), (f" {ROSTER_PLACEHOLDERS['ano_letivo']} ", True),
+        ("   Semestre: ", False), (" {{SEMESTRE}} ", True),
+    ],
+}
+
+
+def _paragraph_text(p):
+    return "".join(t.text or "" for r in p.findall(_W_R) for t in r.findall(_W_T))
+
+
+def _clean(text):
+    # Os campos são preenchidos sobre linhas de "_" e espaços
+    return re.sub(r"\s+", " ", text.replace("_", " ")).strip()
+
+
+def _identification_paragraphs(document):
+    """(prefixo, parágrafo) das linhas de identificação, em todas as cópias da caixa de texto."""
+    for box in document.element.body.iter(qn("w:txbxContent")):
+        for p in box.iter(_W_P):
+            text = _paragraph_text(p)
+            for prefix, _ in FIELD_PATTERNS:
+                if text.startswith(prefix):
+                    yield prefix, p
+
+
+def extract_fields(document):
+    """Extrai os dados pessoais do aluno do quadro de identificação do template."""
+    fields = {}
+    for prefix, p in _identification_paragraphs(document):
+        pattern = dict(FIELD_PATTERNS)[prefix]
+        match = pattern.search(_clean(_paragraph_text(p)))
+        if not match:
+            continue
+        values = {k: (v or "").strip() for k, v in match.groupdict().items()}
+        if prefix == "Data de Nascimento":
+            values["data_nascimento"] = f"{values.pop('dia').zfill(2)}/{values.pop('mes').zfill(2)}/{values.pop('ano')}"
+        for key, value in values.items():
+            fields.setdefault(key, value)
+    return fields
+
+
+def _make_run(paragraph, text, rpr, underline):
+    run = paragraph.makeelement(_W_R, {})
+    if rpr is not None:
+        run_rpr = copy.deepcopy(rpr)
+        for u in run_rpr.findall(_W_U):
+            run_rpr.remove(u)
+        if underline:
+            run_rpr.append(run_rpr.makeelement(_W_U, {qn("w:val"): "single"}))
+        run.append(run_rpr)
+    t = run.makeelement(_W_T, {"{http://www.w3.org/XML/1998/namespace}space": "preserve"})
+    t.text = text
+    run.append(t)
+    return run
+
+
+def _structure(document):
+    """Sequência dos elementos do corpo (parágrafo com ou sem texto, tabela...), sem os dados do aluno."""
+    return tuple(
+        (child.tag, bool(_paragraph_text(child).strip()) if child.tag == _W_P else None)
+        for child in document.element.body
+    )
+
+
+def build_base_template(document):
+    """Troca, no próprio documento, os dados pessoais do quadro de identificação pelos placeholders."""
+    for prefix, p in list(_identification_paragraphs(document)):
+        runs = p.findall(_W_R)
+        rpr = runs[0].find(_W_RPR) if runs else None
+        for r in runs:
+            p.remove(r)
+        for text, underline in BASE_LINES[prefix]:
+            p.append(_make_run(p, text, rpr, underline))
+    return document
+
+
+def convert(template_paths, output_dir, base_template_path=None):
+    """
+    Gera `alunos.json` e `template_base.docx` em `output_dir`. Retorna (cadastro, avisos).
+    O template base sai de `base_template_path` ou, sem ele, do primeiro template
+    com a estrutura de documento mais comum entre os convertidos.
+    """
+    roster, warnings = {}, []
+    structures = {}  # estrutura -> templates com ela
+    for path in template_paths:
+        key = os.path.splitext(os.path.basename(path))[0][len("template_"):]
+        document = Document(path)
+        structures.setdefault(_structure(document), []).append(path)
+        fields = extract_fields(document)
+        missing = [f for f in ("nome",) + tuple(ROSTER_PLACEHOLDERS) if f not in fields]
+        if missing:
+            warnings.append(f"{os.path.basename(path)}: campos não encontrados: {', '.join(missing)}")
+        fields.pop("semestre", None)  # o semestre é o do app, não o do arquivo
+        roster[key] = fields
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, ROSTER_NAME), "w", encoding="utf-8") as f:
+        json.dump(roster, f, indent=4, ensure_ascii=False)
+    if base_template_path is None:
+        # Em empate, vale a estrutura que aparece primeiro (dicionário em ordem de inserção)
+        base_template_path = max(structures.values(), key=len)[0]
+    base = build_base_template(Document(base_template_path))
+    base.save(os.path.join(output_dir, BASE_TEMPLATE_NAME))
+    return roster, warnings
+
+
+if __name__ == "__main__":
+    input_dir = sys.argv[1] if len(sys.argv) > 1 else "data"
+    output_dir = sys.argv[2] if len(sys.argv) > 2 else input_dir
+    paths = sorted(
+        p for p in glob.glob(os.path.join(input_dir, "template_*.docx"))
+        if os.path.basename(p) != BASE_TEMPLATE_NAME
+    )
+    if not paths:
+        sys.exit(f"Nenhum template_*.docx encontrado em '{input_dir}'.")
+    roster, warnings = convert(paths, output_dir, sys.argv[3] if len(sys.argv) > 3 else None)
+    for warning in warnings:
+        print(f"AVISO: {warning}")
+    print(f"{len(roster)} aluno(s) em {os.path.join(output_dir, ROSTER_NAME)}; "
+          f"template base em {os.path.join(output_dir, BASE_TEMPLATE_NAME)}.")
@@ -0,0 +1,191 @@
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from blob_store import BlobStore, content_digest
+from metrics import metrics
+from parecer_docx import build_replacements, render_parecer_docx
+from parecer_text import Rubric, generate_detailed_parecer_text, rubric
+from roster import ROSTER_PLACEHOLDERS, roster_replacements
+from semesters import RENDER_FIELD
+
+DIGEST_FIELD = "docx_digest"
+RUBRIC_SUFFIX = ".json"
+DATE_FORMAT = "%Y-%m-%d"
+
+
+class ParecerRenderer:
+    """
+    Gera o DOCX de um parecer sob demanda a partir das entradas do registro.
+
+    Em vez dos bytes do documento, o registro guarda em `render` o que falta
+    além de aluno, professor e níveis para refazê-lo: a versão (hash) do
+    template e da rubrica, a data e o semestre do parecer, o coordenador e os
+    dados pessoais do aluno no momento da geração. Cada versão de template e de
+    rubrica é guardada uma única vez no blob store, então editar o template ou a
+    rubrica não muda pareceres antigos.
+
+    Os documentos renderizados ficam em um LRU limitado por quantidade e por
+    bytes, para que downloads repetidos não refaçam o DOCX. O python-docx grava
+    a hora no zip, então duas renderizações não têm os mesmos bytes, mas têm o
+    mesmo conteúdo: `docx_digest` (o `content_digest` da primeira renderização)
+    é conferido a cada nova renderização.
+    """
+
+    def __init__(self, blob_store, max_entries=64, max_bytes=64 * 1024 * 1024):
+        self.blob_store = blob_store
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._cache = OrderedDict()  # chave das entradas -> bytes do DOCX
+        self._bytes = 0
+        self._versions = {}  # caminho -> (mtime_ns, tamanho, hash)
+        self._rubrics = {rubric.digest: rubric}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.mismatches = 0
+
+    # --- Versões de template e rubrica ---
+
+    def template_version(self, template_path):
+        """Hash do template; na primeira vez que uma versão aparece, ela é copiada para o blob store."""
+        stat = os.stat(template_path)
+        cached = self._versions.get(template_path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        with open(template_path, "rb") as f:
+            digest = self.blob_store.put(f.read())
+        self._versions[template_path] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def rubric_version(self, current=rubric):
+        if not self.blob_store.exists(current.digest, RUBRIC_SUFFIX):
+            self.blob_store.put(current.source, RUBRIC_SUFFIX)
+        return current.digest
+
+    def _rubric(self, digest):
+        found = self._rubrics.get(digest)
+        if found is None:
+            source = self.blob_store.read(digest, RUBRIC_SUFFIX)
+            found = self._rubrics[digest] = Rubric(json.loads(source.decode("utf-8")), source)
+        return found
+
+    # --- Entradas do registro ---
+
+    def spec(self, template_path, when, semestre, coordenador_name, roster_entry=None):
+        """Campo `render` de um novo registro."""
+        return {
+            "template_sha256": self.template_version(template_path),
+            "rubrica_sha256": self.rubric_version(),
+            "data_parecer": when.strftime(DATE_FORMAT),
+            "semestre": semestre,
+            "coordenador": coordenador_name,
+            "dados_aluno": {field: roster_entry.get(field, "") for field in ROSTER_PLACEHOLDERS} if roster_entry else {},
+        }
+
+    def replacements(self, record):
+        """Placeholders do documento, refeitos só a partir do registro."""
+        spec = record[RENDER_FIELD]
+        with metrics.span("parecer.texto"):
+            if spec["rubrica_sha256"] == rubric.digest:
+                text = generate_detailed_parecer_text(record["characteristics_levels"], record["student_name"])
+            else:
+                old_rubric = self._rubric(spec["rubrica_sha256"])
+                text = old_rubric.render(old_rubric.normalize(record["characteristics_levels"]), record["student_name"])
+        replacements = build_replacements(
+            record["student_name"], text, record["professor"], spec["coordenador"],
+            datetime.strptime(spec["data_parecer"], DATE_FORMAT), spec["semestre"],
+        )
+        if spec["dados_aluno"]:
+            replacements.update(roster_replacements(spec["dados_aluno"]))
+        return replacements
+
+    def template_path(self, record):
+        return self.blob_store.path(record[RENDER_FIELD]["template_sha256"])
+
+    @staticmethod
+    def _key(record):
+        return json.dumps(
+            [record["student_name"], record["professor"], record["characteristics_levels"], record[RENDER_FIELD]],
+            sort_keys=True, ensure_ascii=False,
+        )
+
+    # --- Renderização com cache ---
+
+    def render(self, record):
+        """Bytes do DOCX do registro (do LRU ou renderizado agora)."""
+        key = self._key(record)
+        with self._lock:
+            docx_bytes = self._cache.get(key)
+            if docx_bytes is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return docx_bytes
+            self.misses += 1
+
+        docx_bytes = render_parecer_docx(self.template_path(record), self.replacements(record))
+        if record.get(DIGEST_FIELD):
+            self.verify(record, docx_bytes)  # divergências ficam em `mismatches` (aba Desempenho)
+        self._store(key, docx_bytes)
+        return docx_bytes
+
+    def _store(self, key, docx_bytes):
+        with self._lock:
+            if key in self._cache:
+                return
+            self._cache[key] = docx_bytes
+            self._bytes += len(docx_bytes)
+            while self._cache and (len(self._cache) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._cache.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def verify(self, record, docx_bytes):
+        """Confere se o conteúdo de `docx_bytes` é o mesmo gravado em `docx_digest`."""
+        if content_digest(docx_bytes) == record[DIGEST_FIELD]:
+            return True
+        with self._lock:
+            self.mismatches += 1
+        return False
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "mismatches": self.mismatches,
+                "entries": len(self._cache),
+                "bytes": self._bytes,
+            }
+
+
+if __name__ == "__main__":
+    # Uso: python materialize.py [data/pareceres.jsonl]
+    # Refaz duas vezes o DOCX de cada parecer gravado sob demanda e confere o conteúdo com o `docx_digest`
+    from pareceres_store import PareceresStore
+
+    jsonl_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join("data", "pareceres.jsonl")
+    renderer = ParecerRenderer(BlobStore(os.path.join(os.path.dirname(jsonl_path), "blobs")), max_entries=0)
+    store = PareceresStore(jsonl_path)
+    checked = failed = 0
+    for entry in store.entries():
+        # O índice só marca os registros com spec (`has_render`); o registro completo vem do disco
+        if not entry.get(f"has_{RENDER_FIELD}"):
+            continue
+        record = store.get(entry["id"])
+        if not record.get(DIGEST_FIELD):
+            continue
+        first, second = renderer.render(record), renderer.render(record)
+        checked += 1
+        if not content_digest(first) == content_digest(second) == record[DIGEST_FIELD]:
+            failed += 1
+            print(f"Parecer {entry['id']} ({entry['student_name']}): conteúdo diferente do original.")
+    print(f"{checked} parecer(es) conferido(s), {failed} com diferença.")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,125 @@
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Limites (em segundos) dos buckets do histograma exportado
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Stage:
+    def __init__(self, buckets, window):
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+
+
+class Metrics:
+    """
+    Tempos das etapas do app, agregados no próprio processo.
+
+    Cada etapa (`span`/`observe`) acumula um histograma com buckets fixos
+    (contagem e soma desde o início do processo, no formato do Prometheus) e
+    guarda as últimas `window` medições, usadas para os percentis da janela
+    recente exibidos na tela do administrador.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=1000):
+        self.buckets = tuple(buckets)
+        self.window = window
+        self.started = time.time()
+        self._stages = {}
+        self._lock = threading.Lock()
+        self._last_export = 0.0
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            data = self._stages.get(stage)
+            if data is None:
+                data = self._stages[stage] = _Stage(self.buckets, self.window)
+            data.count += 1
+            data.total += seconds
+            data.recent.append(seconds)
+            for i, limit in enumerate(self.buckets):
+                if seconds <= limit:
+                    data.bucket_counts[i] += 1
+                    break
+
+    @contextmanager
+    def span(self, stage):
+        """Mede o bloco `with` e registra o tempo na etapa `stage` (mesmo se houver exceção)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def snapshot(self):
+        """Resumo de cada etapa: totais desde o início e percentis da janela recente (em ms)."""
+        with self._lock:
+            stages = [(name, data.count, data.total, sorted(data.recent)) for name, data in self._stages.items()]
+        summary = []
+        for name, count, total, recent in sorted(stages):
+            def pct(p):
+                return recent[min(len(recent) - 1, int(p / 100 * len(recent)))] * 1000
+            summary.append({
+                "etapa": name,
+                "total": count,
+                "media_ms": total / count * 1000,
+                "janela": len(recent),
+                "p50_ms": pct(50),
+                "p90_ms": pct(90),
+                "p99_ms": pct(99),
+                "max_ms": recent[-1] * 1000,
+            })
+        return summary
+
+    def prometheus_text(self, prefix="pareceres"):
+        """Histogramas no formato texto de exposição do Prometheus."""
+        name = f"{prefix}_etapa_segundos"
+        lines = [
+            f"# HELP {name} Tempo das etapas do app de pareceres.",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            for stage, data in sorted(self._stages.items()):
+                cumulative = 0
+                for limit, n in zip(self.buckets, data.bucket_counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{etapa="{stage}",le="{limit:g}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{etapa="{stage}",le="+Inf"}} {data.count}')
+                lines.append(f'{name}_sum{{etapa="{stage}"}} {data.total:.6f}')
+                lines.append(f'{name}_count{{etapa="{stage}"}} {data.count}')
+        lines.append(f"# HELP {prefix}_processo_inicio_segundos Início do processo (epoch).")
+        lines.append(f"# TYPE {prefix}_processo_inicio_segundos gauge")
+        lines.append(f"{prefix}_processo_inicio_segundos {self.started:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path, min_interval=15.0):
+        """
+        Grava `prometheus_text()` em `path` (troca atômica do arquivo), no máximo
+        uma vez a cada `min_interval` segundos. Retorna True se o arquivo foi gravado.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._last_export and now - self._last_export < min_interval:
+                return False
+            self._last_export = now
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+        return True
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._last_export = 0.0
+
+
+# Instância do processo: compartilhada pelas sessões do Streamlit e pelos módulos de geração
+metrics = Metrics()
@@ -0,0 +1,54 @@
+from datetime import datetime
+from io import BytesIO
+
+from metrics import metrics
+from semesters import semester_of
+from template_cache import template_cache
+
+MESES_EXTENSO = {
+    1: "Janeiro", 2: "Fevereiro", 3: "Março", 4: "Abril", 5: "Maio", 6: "Junho",
+    7: "Julho", 8: "Agosto", 9: "Setembro", 10: "Outubro", 11: "Novembro", 12: "Dezembro",
+}
+
+
+def build_replacements(student_name, parecer_text, teacher_name, coordenador_name, current_date=None, semestre=None):
+    """
+    Monta o dicionário placeholder -> valor usado para preencher o template.
+    Sem `semestre`, vale o semestre letivo da data do parecer.
+    """
+    current_date = current_date or datetime.now()
+    semestre = semestre or semester_of(current_date)
+    return {
+        "{{NOME_ALUNO}}": student_name,
+        "{{PARECER_GERADO}}": parecer_text,
+        "{{NOME_PROFESSOR}}": teacher_name,
+        "{{NOME_COORDENADOR}}": coordenador_name,
+        "{{DATA_PARECER}}": current_date.strftime("%d/%m/%Y"),
+        "{{DIA_PARECER}}": current_date.strftime("%d"),
+        "{{MES_PARECER}}": MESES_EXTENSO[current_date.month],
+        "{{ANO_CORRENTE}}": current_date.strftime("%Y"),
+        "{{SEMESTRE}}": semestre,
+    }
+
+
+def render_parecer_docx(template_path, replacements):
+    """
+    Preenche o template com os valores de `replacements` e retorna os bytes do DOCX.
+
+    Não depende do Streamlit, então pode ser executada em processos de trabalho
+    (geração em lote).
+    """
+    # Importado aqui para adiar o carregamento do python-docx até a primeira geração
+    from placeholders import fill_placeholders
+
+    # Cópia do template já parseado (o parse só acontece na primeira vez ou se o arquivo mudar)
+    with metrics.span("docx.template"):
+        document = template_cache.get(template_path)
+    # Substitui todos os placeholders (corpo, tabelas, caixas de texto, cabeçalhos e rodapés) em uma única passagem
+    with metrics.span("docx.placeholders"):
+        fill_placeholders(document, replacements)
+
+    with metrics.span("docx.save"):
+        buffer = BytesIO()
+        document.save(buffer)
+        return buffer.getvalue()
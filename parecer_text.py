@@ -0,0 +1,97 @@
+import hashlib
+import itertools
+import json
+import os
+from functools import lru_cache
+
+RUBRICA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rubrica.json")
+STUDENT_MARKER = "{student_name}"
+
+REPROVADO = "reprovado"
+RESSALVAS = "ressalvas"
+APROVADO = "aprovado"
+
+
+class Rubric:
+    """
+    Rubrica do parecer carregada de um arquivo JSON (`rubrica.json`).
+
+    Define os níveis, as características avaliadas (com o texto de cada nível),
+    as regras de aprovação e as conclusões. Na carga, o texto de todas as
+    combinações de níveis é montado uma vez e guardado já dividido em torno do
+    nome do aluno, de modo que gerar um parecer é uma consulta ao dicionário e
+    uma concatenação. Incluir uma característica ou um nível no arquivo só
+    aumenta essa tabela.
+    """
+
+    def __init__(self, data, source=None):
+        # Conteúdo original do arquivo e seu hash: identificam a versão da rubrica
+        self.source = source if source is not None else json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        self.digest = hashlib.sha256(self.source).hexdigest()
+        self.levels = list(data["niveis"])
+        self.default_level = data.get("nivel_padrao", self.levels[-1])
+        self.characteristics = list(data["caracteristicas"])
+        self.keys = tuple(c["chave"] for c in self.characteristics)
+        self._level_set = frozenset(self.levels)
+        self.intro = data["introducao"]
+        self.conclusions = data["conclusoes"]
+        self.fail_if = data["regras"]["reprovado_se"]
+        self.caveat_level = data["regras"]["ressalvas_se_algum"]
+        self._texts = {
+            combo: self._compose(combo)
+            for combo in itertools.product(self.levels, repeat=len(self.keys))
+        }
+
+    @classmethod
+    def load(cls, path=RUBRICA_FILE):
+        with open(path, "rb") as f:
+            source = f.read()
+        return cls(json.loads(source.decode("utf-8")), source)
+
+    def normalize(self, characteristics_levels):
+        """Tupla de níveis na ordem das características; níveis desconhecidos viram o nível padrão."""
+        combo = tuple(map(characteristics_levels.get, self.keys))
+        if combo in self._texts:
+            return combo
+        return tuple(level if level in self._level_set else self.default_level for level in combo)
+
+    def classify(self, combo):
+        """Situação final ("reprovado", "ressalvas" ou "aprovado") de uma combinação normalizada."""
+        levels = dict(zip(self.keys, combo))
+        if all(levels.get(key) == level for key, level in self.fail_if.items()):
+            return REPROVADO
+        if self.caveat_level in combo:
+            return RESSALVAS
+        return APROVADO
+
+    def _compose(self, combo):
+        parts = [self.intro]
+        for characteristic, level in zip(self.characteristics, combo):
+            parts.append(characteristic["textos"][level])
+        parts.append(self.conclusions[self.classify(combo)])
+        # Trechos entre as ocorrências do marcador (pode haver nenhuma ou várias)
+        return tuple("\n\n".join(parts).split(STUDENT_MARKER))
+
+    def render(self, combo, student_name):
+        return student_name.join(self._texts[combo])
+
+
+rubric = Rubric.load()
+
+
+@lru_cache(maxsize=1024)
+def _render_cached(combo, student_name):
+    return rubric.render(combo, student_name)
+
+
+def generate_detailed_parecer_text(characteristics_levels, student_name):
+    """
+    Gera um texto detalhado e contínuo para o parecer, integrando todas as características
+    e buscando aproximar-se de 100-150 palavras.
+    """
+    return _render_cached(rubric.normalize(characteristics_levels), student_name)
+
+
+def classify_levels(characteristics_levels):
+    """Situação final do aluno para os níveis informados (mesma regra usada no texto)."""
+    return rubric.classify(rubric.normalize(characteristics_levels))
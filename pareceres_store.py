@@ -0,0 +1,520 @@
+import json
+import os
+import queue
+import sys
+import threading
+import uuid
+from collections import Counter
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas o lock entre threads do processo
+    fcntl = None
+
+from blob_store import BlobStore, externalize_docx
+from semesters import RENDER_FIELD, record_semester
+
+# Campos que ficam fora do índice: o DOCX em hex dos registros antigos e o spec
+# para refazer o DOCX sob demanda (`RENDER_FIELD`), que só o download usa
+PAYLOAD_FIELDS = ("docx_data", RENDER_FIELD)
+# Campos do registro copiados para o índice: só os que a listagem, a busca (`query`,
+# `find`) e os agregados leem; o resto do registro fica apenas no arquivo de dados
+INDEX_FIELDS = ("uid", "student_name", "data", "semestre", "professor", "characteristics_levels", "opcao", "docx_sha256")
+_FLAG_FIELDS = tuple(f"has_{field}" for field in PAYLOAD_FIELDS) + ("docx_data_corrompido",)
+_POSITION_FIELDS = ("id", "offset", "length")
+_INDEX_KEYS = frozenset(INDEX_FIELDS + _FLAG_FIELDS + _POSITION_FIELDS)
+
+
+def _valid_hex(text):
+    try:
+        bytes.fromhex(text)
+    except ValueError:
+        return False
+    return True
+
+
+def index_fields(record):
+    """
+    Metadados leves de um registro para o índice: os campos de `INDEX_FIELDS` e,
+    no lugar do payload, `has_<campo>`. Um DOCX em hex corrompido é marcado na
+    indexação (`docx_data_corrompido`), para que a listagem mostre o erro em vez
+    de oferecer um download que falharia. Também aceita uma entrada de índice
+    antiga (com os flags já calculados), para enxugá-la.
+    """
+    entry = {k: record[k] for k in INDEX_FIELDS if k in record}
+    if record.get(RENDER_FIELD) and "semestre" not in entry:
+        entry["semestre"] = record_semester(record)  # registros em que o semestre só está no spec
+    for field in PAYLOAD_FIELDS:
+        if field in record:
+            entry[f"has_{field}"] = bool(record[field])
+        elif f"has_{field}" in record:
+            entry[f"has_{field}"] = record[f"has_{field}"]
+    if record.get("docx_data_corrompido") or (record.get("docx_data") and not _valid_hex(record["docx_data"])):
+        entry["has_docx_data"] = False
+        entry["docx_data_corrompido"] = True
+    return entry
+
+
+def _index_payload(entries):
+    """Linhas do índice: JSON compacto e sem o `id`, que é a posição da linha."""
+    return "".join(
+        json.dumps({k: v for k, v in e.items() if k != "id"}, ensure_ascii=False, separators=(",", ":")) + "\n"
+        for e in entries
+    ).encode("utf-8")
+
+
+def _legacy_key(record):
+    return (record.get("student_name"), record.get("data"), record.get("professor"))
+
+
+def same_parecer(a, b):
+    """
+    Se dois registros (ou entradas de índice) são o mesmo parecer: pelo `uid`
+    gravado com o registro ou, em registros anteriores ao `uid`, por aluno, data
+    e professor.
+    """
+    if a.get("uid") or b.get("uid"):
+        return a.get("uid") == b.get("uid")
+    return _legacy_key(a) == _legacy_key(b)
+
+
+class PareceresStore:
+    """
+    Armazenamento append-only dos pareceres em JSON Lines.
+
+    Cada parecer ocupa uma linha em `data_path`. Um índice separado
+    (`index_path`, também JSON Lines) guarda, para cada registro, o offset e o
+    tamanho da linha no arquivo de dados junto com os metadados leves
+    (aluno, data, professor, níveis). Salvar um parecer custa um append em cada
+    arquivo; listar os pareceres lê apenas o índice.
+
+    Em memória, o índice também é organizado por aluno e por dia (`query`), para
+    que a tela do administrador filtre e pagine sem percorrer todos os registros.
+
+    Os ids são posições no store e mudam quando ele é compactado (`compact`);
+    cada registro novo recebe um `uid`, que não muda, e `find` localiza um
+    parecer listado antes da compactação.
+    """
+
+    def __init__(self, data_path, index_path=None):
+        self.data_path = data_path
+        self.index_path = index_path or os.path.splitext(data_path)[0] + ".idx"
+        self.lock_path = os.path.splitext(data_path)[0] + ".lock"
+        self._lock = threading.Lock()
+        self._file_lock_depth = 0
+        self._reset()
+
+    def _reset(self):
+        self._entries = []
+        self._by_student = {}  # nome do aluno -> ids
+        self._by_date = {}  # "AAAA-MM-DD" -> ids
+        self._by_uid = {}  # uid -> id
+        self._index_read = 0  # bytes do índice já carregados em memória
+        self._index_inode = None
+        self._signature = None  # (inode, tamanho do índice, tamanho dos dados) na última leitura
+
+    # --- Índice ---
+    def _make_entry(self, record, offset, length):
+        entry = index_fields(record)
+        entry["id"] = len(self._entries)
+        entry["offset"] = offset
+        entry["length"] = length
+        return entry
+
+    def _add_entry(self, entry):
+        self._entries.append(entry)
+        if entry.get("student_name"):
+            self._by_student.setdefault(entry["student_name"], []).append(entry["id"])
+        if entry.get("data"):
+            self._by_date.setdefault(entry["data"][:10], []).append(entry["id"])
+        if entry.get("uid"):
+            self._by_uid[entry["uid"]] = entry["id"]
+
+    @contextmanager
+    def _file_lock(self):
+        """
+        Lock exclusivo entre processos (flock em `<dados>.lock`) para leituras que
+        reparam o índice e para os appends. Chamado sempre com `self._lock` já obtido.
+        """
+        if fcntl is None or self._file_lock_depth:
+            self._file_lock_depth += 1
+            try:
+                yield
+            finally:
+                self._file_lock_depth -= 1
+            return
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._file_lock_depth += 1
+            try:
+                yield
+            finally:
+                self._file_lock_depth -= 1
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Carrega apenas a parte do índice que ainda não foi lida e repara o final se preciso."""
+        index_stat = os.stat(self.index_path) if os.path.exists(self.index_path) else None
+        data_size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        signature = (index_stat.st_ino, index_stat.st_size, data_size) if index_stat else (None, 0, data_size)
+        if signature == self._signature:
+            return  # nada mudou em disco desde a última leitura
+        with self._file_lock():
+            self._load()
+
+    def _load(self):
+        index_stat = os.stat(self.index_path) if os.path.exists(self.index_path) else None
+        data_size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        if index_stat is None or index_stat.st_ino != self._index_inode or index_stat.st_size < self._index_read:
+            # Índice substituído ou truncado fora do app: recarrega do zero
+            if self._index_read:
+                self._reset()
+            self._index_inode = index_stat.st_ino if index_stat else None
+
+        if index_stat:
+            with open(self.index_path, "rb") as f:
+                f.seek(self._index_read)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # linha incompleta (gravação interrompida)
+                    entry = json.loads(line)
+                    if not _INDEX_KEYS.issuperset(entry):
+                        # Linha gravada quando o índice copiava o registro inteiro
+                        entry = dict(index_fields(entry), offset=entry["offset"], length=entry["length"])
+                    entry["id"] = len(self._entries)  # o id é a posição da linha no índice
+                    self._add_entry(entry)
+                    self._index_read += len(line)
+            if os.path.getsize(self.index_path) > self._index_read:
+                # Linha incompleta no fim do índice (gravação interrompida): descarta antes
+                # de qualquer append, senão a próxima linha seria colada nela
+                os.truncate(self.index_path, self._index_read)
+
+        # Registros gravados nos dados mas ausentes do índice (queda entre os dois appends)
+        indexed_end = self._entries[-1]["offset"] + self._entries[-1]["length"] if self._entries else 0
+        if indexed_end > data_size:
+            # Índice de dados maiores que os atuais (queda no meio de `compact`): refaz o índice a partir dos dados
+            with open(self.index_path, "wb"):
+                pass
+            self._reset()
+            self._index_inode = os.stat(self.index_path).st_ino
+            indexed_end = 0
+        if os.path.exists(self.data_path) and os.path.getsize(self.data_path) > indexed_end:
+            missing = []
+            with open(self.data_path, "rb") as f:
+                f.seek(indexed_end)
+                offset = indexed_end
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    entry = self._make_entry(json.loads(line), offset, len(line))
+                    self._add_entry(entry)
+                    missing.append(entry)
+                    offset += len(line)
+            if missing:
+                self._append_index(missing)
+
+        index_size = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        self._signature = (self._index_inode, index_size, data_size)
+
+    def _append_index(self, entries):
+        payload = _index_payload(entries)
+        with open(self.index_path, "ab") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+            self._index_inode = os.fstat(f.fileno()).st_ino
+        self._index_read += len(payload)
+
+    # --- API pública ---
+    def entries(self, start=0):
+        """
+        Retorna os metadados dos pareceres (sem o DOCX), na ordem de gravação,
+        a partir do id `start` (todos, por padrão).
+        """
+        with self._lock:
+            self._refresh()
+            return self._entries[start:]
+
+    def students(self):
+        """Nomes dos alunos que têm pareceres salvos, em ordem alfabética."""
+        with self._lock:
+            self._refresh()
+            return sorted(self._by_student)
+
+    def dates(self):
+        """Dias ("AAAA-MM-DD") com pareceres salvos, do mais recente para o mais antigo."""
+        with self._lock:
+            self._refresh()
+            return sorted(self._by_date, reverse=True)
+
+    def query(self, student_name=None, date=None, offset=0, limit=None):
+        """
+        Filtra os pareceres por aluno e/ou dia usando os índices e retorna
+        (total de resultados, metadados da página pedida), na ordem de gravação.
+        """
+        with self._lock:
+            self._refresh()
+            if student_name and date:
+                day_ids = set(self._by_date.get(date, ()))
+                ids = [i for i in self._by_student.get(student_name, ()) if i in day_ids]
+            elif student_name:
+                ids = self._by_student.get(student_name, [])
+            elif date:
+                ids = self._by_date.get(date, [])
+            else:
+                ids = range(len(self._entries))
+            page = ids[offset:offset + limit] if limit is not None else ids[offset:]
+            return len(ids), [self._entries[i] for i in page]
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._entries)
+
+    def get(self, record_id):
+        """Lê do disco o registro completo (incluindo o payload) de um único parecer."""
+        with self._lock:
+            self._refresh()
+            entry = self._entries[record_id]
+        return self._read(entry)
+
+    def _read(self, entry):
+        with open(self.data_path, "rb") as f:
+            f.seek(entry["offset"])
+            return json.loads(f.read(entry["length"]))
+
+    def find(self, entry):
+        """
+        Registro completo do parecer de `entry` (entrada de uma listagem anterior,
+        talvez com um id de antes de uma compactação) ou None se ele não estiver
+        mais no store.
+        """
+        for _ in range(2):  # uma nova tentativa se o store for compactado durante a leitura
+            with self._lock:
+                self._refresh()
+                if entry.get("uid"):
+                    candidates = [self._by_uid.get(entry["uid"])]
+                else:
+                    candidates = [entry.get("id")] + self._by_student.get(entry.get("student_name"), [])
+                found = next((
+                    self._entries[i] for i in candidates
+                    if i is not None and i < len(self._entries) and same_parecer(self._entries[i], entry)
+                ), None)
+            if found is None:
+                return None
+            try:
+                record = self._read(found)
+            except ValueError:
+                continue
+            if same_parecer(record, entry):
+                return record
+        return None
+
+    def append(self, record):
+        """Acrescenta um parecer ao final do arquivo e retorna o seu id."""
+        return self.append_many([record])[0]
+
+    def append_many(self, records):
+        """
+        Acrescenta vários pareceres com uma única escrita (seguida de fsync) em cada
+        arquivo e retorna os ids. Registros sem `uid` recebem um novo (na cópia
+        gravada). Os dados são gravados antes do índice; uma queda
+        no meio deixa no máximo uma linha incompleta, ignorada na leitura.
+        """
+        with self._lock, self._file_lock():
+            return self._append_locked(records)
+
+    def _append_locked(self, records):
+        """`append_many` com `self._lock` e o lock de arquivo já obtidos."""
+        self._refresh()
+        offset = self._entries[-1]["offset"] + self._entries[-1]["length"] if self._entries else 0
+        if os.path.exists(self.data_path) and os.path.getsize(self.data_path) > offset:
+            # Linha incompleta de uma gravação interrompida: descarta antes do append
+            os.truncate(self.data_path, offset)
+        lines = []
+        new_entries = []
+        for record in records:
+            if "uid" not in record:
+                record = dict(record, uid=uuid.uuid4().hex)
+            line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+            entry = self._make_entry(record, offset, len(line))
+            self._add_entry(entry)
+            new_entries.append(entry)
+            lines.append(line)
+            offset += len(line)
+        with open(self.data_path, "ab") as f:
+            f.write(b"".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        self._append_index(new_entries)
+        self._signature = None  # força a conferência dos tamanhos na próxima leitura
+        return [e["id"] for e in new_entries]
+
+    def compact(self, keep, before_replace=None):
+        """
+        Reescreve o armazenamento só com os pareceres em que `keep(registro)` é
+        verdadeiro e retorna os registros removidos (completos, com o payload).
+        Os pareceres mantidos são renumerados a partir de 0 (o `uid` de cada um não
+        muda; veja `find`). Os novos arquivos são
+        gravados ao lado e trocam os antigos com `os.replace` (dados, depois índice).
+
+        `before_replace(removidos)`, se informado, é chamado com os locks ainda
+        obtidos e antes da troca dos arquivos (por exemplo, para arquivar os
+        removidos): nenhum parecer é gravado no meio, e se ele falhar nada muda.
+        """
+        with self._lock, self._file_lock():
+            self._refresh()
+            kept, removed = [], []
+            if self._entries:
+                with open(self.data_path, "rb") as f:
+                    for entry in self._entries:
+                        f.seek(entry["offset"])
+                        record = json.loads(f.read(entry["length"]))
+                        (kept if keep(record) else removed).append(record)
+            if not removed:
+                return []
+            if before_replace is not None:
+                before_replace(removed)
+
+            self._reset()
+            lines, entries, offset = [], [], 0
+            for record in kept:
+                line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+                entry = self._make_entry(record, offset, len(line))
+                self._add_entry(entry)
+                entries.append(entry)
+                lines.append(line)
+                offset += len(line)
+            index_payload = _index_payload(entries)
+            for path, payload in ((self.data_path, b"".join(lines)), (self.index_path, index_payload)):
+                with open(path + ".tmp", "wb") as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(self.data_path + ".tmp", self.data_path)
+            os.replace(self.index_path + ".tmp", self.index_path)
+            self._index_inode = os.stat(self.index_path).st_ino
+            self._index_read = len(index_payload)
+            self._signature = None
+            return removed
+
+
+class GroupCommitWriter:
+    """
+    Escritor único do processo para o `PareceresStore`.
+
+    As sessões enfileiram registros com `submit`/`write`; uma thread de gravação
+    junta tudo o que estiver na fila e grava o lote com um único append + fsync.
+    Enquanto um lote é gravado, os pedidos seguintes se acumulam para o próximo,
+    então várias sessões salvando ao mesmo tempo pagam um fsync por lote e não um
+    por parecer. Cada chamador recebe, pelo `Future`, o id do seu registro (ou a
+    exceção da gravação).
+    """
+
+    def __init__(self, store, max_batch=512):
+        self.store = store
+        self.max_batch = max_batch
+        self.batches = 0
+        self.records = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="pareceres-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, record):
+        """Enfileira um registro e retorna um Future com o id após a gravação."""
+        future = Future()
+        self._queue.put((record, future))
+        return future
+
+    def write(self, record, timeout=None):
+        """Enfileira um registro e espera a confirmação da gravação (retorna o id)."""
+        return self.submit(record).result(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            try:
+                ids = self.store.append_many([record for record, _ in batch])
+            except BaseException as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                self.batches += 1
+                self.records += len(batch)
+                for (_, future), record_id in zip(batch, ids):
+                    future.set_result(record_id)
+            if stop:
+                return
+
+    def close(self):
+        """Grava o que ainda estiver na fila e encerra a thread de gravação."""
+        self._queue.put(None)
+        self._thread.join()
+
+
+def migrate_from_json(json_path, store, transform=None):
+    """
+    Migração única do antigo `pareceres.json` (lista completa reescrita a cada save)
+    para o armazenamento append-only. O arquivo antigo é renomeado para
+    `<nome>.migrando` antes da gravação e para `<nome>.migrado` depois dela, para
+    que a migração não seja repetida. Se o processo cair no meio, a próxima
+    chamada retoma a partir do `.migrando` e só grava os pareceres que ainda não
+    chegaram ao store (mesmo aluno, data e professor).
+    `transform`, se informado, é aplicado a cada registro antes da gravação.
+    Retorna o número de registros migrados.
+    """
+    in_progress_path = json_path + ".migrando"
+    # Vários processos podem iniciar ao mesmo tempo: a migração inteira roda com o
+    # lock do store, e quem chega depois encontra o arquivo já migrado (nada a fazer)
+    with store._lock, store._file_lock():
+        resuming = os.path.exists(in_progress_path)
+        if not resuming:
+            if not os.path.exists(json_path):
+                return 0
+            os.replace(json_path, in_progress_path)
+        records = []
+        if os.path.getsize(in_progress_path) > 0:
+            with open(in_progress_path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        if resuming and records:
+            store._refresh()
+            already_migrated = Counter(_legacy_key(e) for e in store._entries)
+            pending = []
+            for record in records:
+                key = _legacy_key(record)
+                if already_migrated[key]:
+                    already_migrated[key] -= 1
+                else:
+                    pending.append(record)
+            records = pending
+        if transform:
+            records = [transform(r) for r in records]
+        if records:
+            store._append_locked(records)
+        os.replace(in_progress_path, json_path + ".migrado")
+        return len(records)
+
+
+if __name__ == "__main__":
+    # Uso: python pareceres_store.py [data/pareceres.json] [data/pareceres.jsonl]
+    json_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join("data", "pareceres.json")
+    jsonl_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join("data", "pareceres.jsonl")
+    blobs = BlobStore(os.path.join(os.path.dirname(jsonl_path), "blobs"))
+    migrados = migrate_from_json(json_path, PareceresStore(jsonl_path), lambda r: externalize_docx(r, blobs))
+    print(f"{migrados} parecer(es) migrado(s) para {jsonl_path}.")
@@ -0,0 +1,111 @@
+import copy
+import re
+
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.opc.part import XmlPart
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+from docx.text.run import Run
+
+PLACEHOLDER_RE = re.compile(r"\{\{[A-Za-z0-9_]+\}\}")
+
+# Partes do pacote que podem conter placeholders
+TEXT_PART_TYPES = (
+    CT.WML_DOCUMENT_MAIN,
+    CT.WML_HEADER,
+    CT.WML_FOOTER,
+    CT.WML_FOOTNOTES,
+    CT.WML_ENDNOTES,
+)
+
+# Formatação aplicada ao parágrafo que recebe o texto do parecer
+PARECER_PLACEHOLDER = "{{PARECER_GERADO}}"
+PARECER_FONT = "Times New Roman"
+
+# Parágrafos com algum "{" em um run direto: os únicos que podem conter marcadores,
+# mesmo quando o Word divide o marcador em vários runs
+_CANDIDATE_PARAGRAPHS = './/w:p[w:r/w:t[contains(., "{")]]'
+
+_W_R = qn("w:r")
+_W_T = qn("w:t")
+_W_RPR = qn("w:rPr")
+# Runs com objetos (imagens, caixas de texto) nunca são removidos na reconstrução
+_MC_ALTERNATE_CONTENT = "{http://schemas.openxmlformats.org/markup-compatibility/2006}AlternateContent"
+_OBJECT_TAGS = (qn("w:drawing"), qn("w:pict"), qn("w:object"), _MC_ALTERNATE_CONTENT)
+
+
+def iter_text_parts(document):
+    """Corpo, cabeçalhos, rodapés e notas do documento (cada parte uma única vez)."""
+    for part in document.part.package.iter_parts():
+        if isinstance(part, XmlPart) and part.content_type in TEXT_PART_TYPES:
+            yield part
+
+
+def _run_text(run_element):
+    # Só os w:t diretos: o texto de caixas de texto ancoradas no run pertence a outro parágrafo
+    return "".join(t.text or "" for t in run_element.findall(_W_T))
+
+
+def _is_object_run(run_element):
+    return any(child.tag in _OBJECT_TAGS for child in run_element)
+
+
+def fill_placeholders(document, replacements):
+    """
+    Substitui todos os marcadores `{{...}}` do documento em uma única passagem.
+
+    Percorre cada parágrafo (inclusive os de tabelas aninhadas, caixas de texto,
+    cabeçalhos e rodapés) uma vez. Quando cada marcador está inteiro dentro de
+    um run, o texto é trocado no próprio run e a formatação de cada trecho do
+    parágrafo é mantida. Se algum marcador foi dividido entre runs pelo Word, o
+    parágrafo é reconstruído uma única vez, com todos os valores já substituídos,
+    em um só run com a formatação do primeiro run original. O parágrafo de
+    `{{PARECER_GERADO}}` é justificado e usa Times New Roman. Marcadores sem valor
+    em `replacements` ficam como estão. Retorna o número de marcadores substituídos.
+    """
+    def substitute(text):
+        return PLACEHOLDER_RE.sub(lambda m: str(replacements.get(m.group(0), m.group(0))), text)
+
+    count = 0
+    for part in iter_text_parts(document):
+        for p in part.element.xpath(_CANDIDATE_PARAGRAPHS):
+            # Apenas os runs diretos do parágrafo; parágrafos aninhados (caixas de texto)
+            # são selecionados pelo próprio xpath
+            runs = [r for r in p.findall(_W_R) if not _is_object_run(r)]
+            if not runs:
+                continue
+            run_texts = [_run_text(r) for r in runs]
+            text = "".join(run_texts)
+            if "{{" not in text:
+                continue
+
+            found = [m for m in PLACEHOLDER_RE.findall(text) if m in replacements]
+            if not found:
+                continue
+            paragraph = Paragraph(p, None)
+
+            if sum(len(PLACEHOLDER_RE.findall(t)) for t in run_texts) == len(PLACEHOLDER_RE.findall(text)):
+                # Todos os marcadores estão inteiros em um run: troca no lugar
+                changed_runs = []
+                for r, run_text in zip(runs, run_texts):
+                    if "{{" in run_text and PLACEHOLDER_RE.search(run_text):
+                        new_run = Run(r, paragraph)
+                        new_run.text = substitute(run_text)
+                        changed_runs.append((new_run, run_text))
+                parecer_runs = [run for run, run_text in changed_runs if PARECER_PLACEHOLDER in run_text]
+            else:
+                rpr = runs[0].find(_W_RPR)
+                for r in runs:
+                    p.remove(r)
+                new_run = paragraph.add_run(substitute(text))
+                if rpr is not None:
+                    new_run._r.insert(0, copy.deepcopy(rpr))
+                parecer_runs = [new_run]
+
+            if PARECER_PLACEHOLDER in found:
+                paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+                for run in parecer_runs:
+                    run.font.name = PARECER_FONT
+            count += len(found)
+    return count
@@ -0,0 +1,52 @@
+import json
+import os
+import unicodedata
+
+# Campo do cadastro do aluno -> placeholder correspondente no template base
+ROSTER_PLACEHOLDERS = {
+    "filiacao_mae": "{{FILIACAO_MAE}}",
+    "filiacao_pai": "{{FILIACAO_PAI}}",
+    "endereco": "{{ENDERECO}}",
+    "uf": "{{UF}}",
+    "data_nascimento": "{{DATA_NASCIMENTO}}",
+    "naturalidade": "{{NATURALIDADE}}",
+    "periodo": "{{PERIODO}}",
+    "turma": "{{TURMA}}",
+    "turno": "{{TURNO}}",
+    "numero": "{{NUMERO}}",
+    "ano_letivo": "{{ANO_LETIVO}}",
+}
+
+
+def sanitize_student_name_for_filename(name):
+    """
+    Sanitiza o nome do aluno para ser usado como parte de um nome de arquivo.
+    Removes acentos, converte para minúsculas e substitui espaços por underscores.
+    """
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('utf-8')
+    name = name.lower()
+    name = name.replace(" ", "_")
+    name = "".join(c for c in name if c.isalnum() or c == '_')
+    return name
+
+
+def load_roster(path):
+    """
+    Carrega o cadastro dos alunos (`alunos.json`): chave (nome sanitizado, o mesmo
+    usado no nome do antigo template do aluno) -> dados pessoais. Cada aluno também
+    fica acessível pelo nome sanitizado que aparece no documento, quando diferente.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        roster = json.load(f)
+    for key, entry in list(roster.items()):
+        alias = sanitize_student_name_for_filename(entry.get("nome", ""))
+        if alias and alias not in roster:
+            roster[alias] = entry
+    return roster
+
+
+def roster_replacements(entry):
+    """Placeholders dos dados pessoais do aluno para o template base."""
+    return {placeholder: entry.get(field, "") for field, placeholder in ROSTER_PLACEHOLDERS.items()}
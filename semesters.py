@@ -0,0 +1,30 @@
+from datetime import datetime
+
+# Campo do registro com o spec para refazer o DOCX sob demanda (ver `materialize`)
+RENDER_FIELD = "render"
+
+
+def semester_of(when):
+    """Semestre letivo ("AAAA.1" de janeiro a junho, "AAAA.2" de julho a dezembro) de uma data."""
+    if isinstance(when, str):
+        when = datetime.strptime(when[:10], "%Y-%m-%d")
+    return f"{when.year}.{1 if when.month <= 6 else 2}"
+
+
+def current_semester(configured=None, now=None):
+    """Semestre em andamento: o configurado, se houver, ou o da data de hoje."""
+    return configured or semester_of(now or datetime.now())
+
+
+def record_semester(record):
+    """
+    Semestre de um parecer: o gravado no registro ou, em registros anteriores
+    aos semestres, o da data do parecer.
+    """
+    semester = record.get("semestre") or (record.get(RENDER_FIELD) or {}).get("semestre")
+    if semester:
+        return semester
+    try:
+        return semester_of(record.get("data") or "")
+    except ValueError:
+        return "?"
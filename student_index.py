@@ -0,0 +1,146 @@
+import heapq
+import os
+from bisect import bisect_left
+
+from roster import load_roster, sanitize_student_name_for_filename
+
+NO_CLASS = "Sem turma"
+
+
+def name_tokens(text):
+    """Palavras do nome normalizadas como em `sanitize_student_name_for_filename` (sem acentos, minúsculas)."""
+    return [token for token in sanitize_student_name_for_filename(text).split("_") if token]
+
+
+def class_label(entry):
+    """Rótulo da turma de um aluno do cadastro (período, turma e turno)."""
+    if not entry:
+        return NO_CLASS
+    parts = [
+        f"{entry['periodo']} Período" if entry.get("periodo") else "",
+        f"Turma {entry['turma']}" if entry.get("turma") else "",
+        entry.get("turno", ""),
+    ]
+    return " - ".join(p for p in parts if p) or NO_CLASS
+
+
+class StudentIndex:
+    """
+    Índice dos alunos para busca e para a escolha do template.
+
+    Montado uma vez a partir do cadastro (`alunos.json`) e dos templates
+    existentes na pasta de dados (uma única listagem da pasta). Cada nome é
+    quebrado em palavras normalizadas (sem acento, minúsculas); a busca casa
+    cada palavra digitada como prefixo de alguma palavra do nome, em qualquer
+    ordem ("joao silva" encontra "João Pedro da Silva"), e devolve só os
+    primeiros resultados. `resolve` devolve o template e os dados do aluno
+    direto do índice, sem consultar o disco.
+    """
+
+    def __init__(self, roster, base_template=None, legacy_templates=None):
+        legacy_templates = legacy_templates or {}
+        self.base_template = base_template
+
+        students, seen, known_keys = [], set(), set()
+        for key, entry in roster.items():
+            if id(entry) in seen:
+                continue  # apelidos de `load_roster` apontam para o mesmo aluno
+            seen.add(id(entry))
+            name = entry.get("nome") or key.replace("_", " ").title()
+            keys = {key, sanitize_student_name_for_filename(name)}
+            legacy = next((legacy_templates[k] for k in sorted(keys) if k in legacy_templates), None)
+            students.append((name, keys, entry, legacy))
+            known_keys |= keys
+        # Alunos que só têm o antigo template específico (sem cadastro)
+        for key, path in legacy_templates.items():
+            if key not in known_keys:
+                students.append((key.replace("_", " ").title(), {key}, None, path))
+
+        # (nome, chave de ordenação sem acentos, dados do cadastro, template antigo)
+        students.sort(key=lambda s: sanitize_student_name_for_filename(s[0]))
+        self._students = []
+        self._by_key = {}  # nome sanitizado (e chave do cadastro) -> id do aluno
+        self._postings = {}  # palavra normalizada -> ids dos alunos
+        for student_id, (name, keys, entry, legacy) in enumerate(students):
+            self._students.append((name, sanitize_student_name_for_filename(name), entry, legacy))
+            for key in keys:
+                self._by_key.setdefault(key, student_id)
+            for token in set(name_tokens(name)):
+                self._postings.setdefault(token, []).append(student_id)
+        self._tokens = sorted(self._postings)
+        self.names = [s[0] for s in self._students]
+
+    @classmethod
+    def build(cls, roster_path, data_dir, base_template_name="template_base.docx"):
+        """Índice a partir do cadastro e dos templates `template_*.docx` de `data_dir`."""
+        base_template, legacy_templates = None, {}
+        if os.path.isdir(data_dir):
+            for item in os.scandir(data_dir):
+                if item.name == base_template_name:
+                    base_template = item.path
+                elif item.name.startswith("template_") and item.name.endswith(".docx"):
+                    legacy_templates[item.name[len("template_"):-len(".docx")]] = item.path
+        return cls(load_roster(roster_path), base_template, legacy_templates)
+
+    def __len__(self):
+        return len(self._students)
+
+    def _matching(self, token):
+        """Ids dos alunos com alguma palavra que começa com `token` e quantos casam exatamente."""
+        start = bisect_left(self._tokens, token)
+        ids, exact = set(), set()
+        for candidate in self._tokens[start:]:
+            if not candidate.startswith(token):
+                break
+            ids.update(self._postings[candidate])
+            if candidate == token:
+                exact.update(self._postings[candidate])
+        return ids, exact
+
+    def search(self, query, limit=20):
+        """
+        Retorna (total de alunos encontrados, até `limit` nomes). Sem texto de
+        busca, devolve os primeiros nomes em ordem alfabética.
+        """
+        tokens = name_tokens(query or "")
+        if not tokens:
+            return len(self.names), self.names[:limit]
+
+        matches, exact_counts = None, {}
+        for token in sorted(set(tokens), key=len, reverse=True):
+            ids, exact = self._matching(token)
+            matches = ids if matches is None else matches & ids
+            if not matches:
+                return 0, []
+            for student_id in exact:
+                exact_counts[student_id] = exact_counts.get(student_id, 0) + 1
+
+        prefix = "_".join(tokens)
+        # Primeiro quem começa com o texto digitado, depois quem tem mais palavras exatas, depois em ordem alfabética
+        top = heapq.nsmallest(limit, matches, key=lambda i: (
+            not self._students[i][1].startswith(prefix), -exact_counts.get(i, 0), self._students[i][1]
+        ))
+        return len(matches), [self._students[i][0] for i in top]
+
+    def resolve(self, student_name):
+        """
+        Template e dados do cadastro do aluno: o template base com os dados do
+        cadastro ou, para quem não está no cadastro, o antigo template específico
+        (sem dados extras). Retorna (None, None) se não houver nenhum dos dois.
+        """
+        student_id = self._by_key.get(sanitize_student_name_for_filename(student_name))
+        if student_id is None:
+            return None, None
+        _, _, entry, legacy = self._students[student_id]
+        if entry is not None and self.base_template:
+            return self.base_template, entry
+        if legacy:
+            return legacy, None
+        return None, None
+
+    def classes(self):
+        """Turmas (período, turma e turno) -> nomes dos alunos, ambos em ordem."""
+        groups = {}
+        for name, _, entry, _ in self._students:
+            groups.setdefault(class_label(entry), []).append(name)
+        return dict(sorted(groups.items()))
@@ -0,0 +1,91 @@
+import copy
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+
+
+class TemplateCache:
+    """
+    Cache, compartilhado pelo processo, dos templates DOCX já parseados.
+
+    A chave é o caminho do arquivo; a entrada guarda o `mtime`/tamanho do
+    arquivo no momento do parse e é descartada se o template for alterado em
+    disco. A remoção segue a ordem LRU e respeita tanto um número máximo de
+    templates quanto um limite de memória estimado pelo tamanho descomprimido
+    das partes do DOCX. Cada chamada de `get` devolve uma cópia do documento,
+    que pode ser preenchida sem afetar o template em cache.
+    """
+
+    def __init__(self, max_entries=16, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # path -> (mtime_ns, size, document, custo)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _estimate_cost(path):
+        with zipfile.ZipFile(path) as zf:
+            return sum(info.file_size for info in zf.infolist())
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, _, _, cost) = self._entries.popitem(last=False)
+            self._bytes -= cost
+            self.evictions += 1
+
+    def get(self, path):
+        """Retorna uma cópia do documento parseado de `path`, parseando só quando necessário."""
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                document = entry[2]
+            else:
+                if entry:
+                    self._bytes -= entry[3]
+                    del self._entries[path]
+                self.misses += 1
+                document = None
+
+        if document is None:
+            # python-docx só é importado na primeira geração (não pesa no início do app)
+            from docx import Document
+
+            # O parse acontece fora do lock para não bloquear outras sessões
+            document = Document(path)
+            cost = self._estimate_cost(path)
+            with self._lock:
+                if path in self._entries:
+                    self._bytes -= self._entries.pop(path)[3]
+                self._entries[path] = (stat.st_mtime_ns, stat.st_size, document, cost)
+                self._bytes += cost
+                self._evict()
+
+        return copy.deepcopy(document)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Contadores de uso do cache (acertos, falhas, remoções, ocupação)."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+# Instância única do processo (sobrevive aos reruns do Streamlit)
+template_cache = TemplateCache()